@@ -1,8 +1,17 @@
-import requests
-from flask import Flask, request, jsonify
-from dataclasses import dataclass, field
+import json
+import queue
+import time
+
+from flask import Flask, Response, abort, request, jsonify
+from dataclasses import asdict, dataclass, field
 from flask_cors import CORS
 
+from bulk_control import ACTIVITIES, summary, valid_target_id
+from entity_cache import EntityCache
+from resolver import HostResolver
+from session_pool import SessionPool
+from state_stream import StreamHub
+
 
 
 ## CONSTANTS
@@ -19,6 +28,41 @@ PASSWORD = "AccessOS"
 
 app = Flask(__name__)
 CORS(app)
+
+# <serial>.local lookups are cached (stale-while-revalidate) instead of hitting mDNS per connection
+resolver = HostResolver()
+# area/door/input/output config, shared by all sessions; live state is not cached
+entities = EntityCache()
+# one warm, auto-relogging InceptionClient per controller + user; the browser only sees a token
+sessions = SessionPool(resolver=resolver, cache=entities)
+# one upstream long-poll per controller + user, fanned out to that user's open dashboards over /stream
+hub = StreamHub()
+sessions.on_close.append(lambda key, client: hub.drop(key, client))
+HEARTBEAT_S = 15
+
+
+def session_token(allow_query=False):
+    auth = request.headers.get("Authorization", "")
+    if auth.startswith("Bearer "):
+        return auth[len("Bearer "):]
+    if allow_query and request.args.get("token"):
+        # only for /stream: EventSource can't send headers, and URLs end up in access logs
+        return request.args["token"]
+    return (request.get_json(silent=True) or {}).get("token")
+
+
+def current_client():
+    client = sessions.get(session_token())
+    if client is None:
+        abort(401)
+    return client
+
+
+@app.errorhandler(401)
+def unauthorised(e):
+    return jsonify({"success": False, "error": "not logged in or session expired"}), 401
+
+
 @app.route("/login", methods=["POST"])
 def login():
     
@@ -27,38 +71,113 @@ def login():
     username = data["Username"]
     password = data["Password"]
     print(f"-------------------Attempting login:-----------------------------\nSystem: {icpserial}\nUsername: {username}\n-----------------------------------------------------------------------") 
-    login_url = f"http://{icpserial}.local/api/v1/authentication/login"
-    login_body = {
-        "Username": username,
-        "Password": password
-    }
-    login_resp = requests.post(login_url, json=login_body, timeout=5)
-    print("Login status:", login_resp.status_code)
-    print("Login body:", login_resp.text)
-
-    data = login_resp.json()
-    session_id = data["UserID"]
+    try:
+        token = sessions.login(icpserial, username, password)
+    except Exception as e:
+        print("Login failed:", e)
+        return jsonify({"success": False, "error": str(e)}), 401
+
+    print("Login OK:", sessions.stats())
     return jsonify({
         "success": True,
-        "UserID": session_id,
+        "Token": token,
         "Username": username,
-        }), session_id
+        })
+
+
+@app.route("/logout", methods=["POST"])
+def logout():
+    sessions.logout(session_token())
+    return jsonify({"success": True})
+
+
+@app.route("/metrics/resolver", methods=["GET"])
+def resolver_metrics():
+    return jsonify(resolver.stats())
+
+
+@app.route("/stream", methods=["GET"])
+def stream():
+    token = session_token(allow_query=True)
+    client = sessions.get(token)
+    if client is None:
+        abort(401)
+    key = sessions.key_for(token)
+    q = hub.subscribe(key, client)
+
+    def events():
+        try:
+            while True:
+                try:
+                    event, data = q.get(timeout=HEARTBEAT_S)
+                except queue.Empty:
+                    event = None
+                # an open dashboard counts as use: get() keeps the session from being reaped as idle
+                if sessions.get(token) is not client:
+                    # logged out, reaped or replaced: reconnecting gets a 401 or the new client
+                    yield "event: resync\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+                if event == "resync":
+                    return
+        finally:
+            hub.unsubscribe(key, q)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/metrics/cache", methods=["GET"])
+def cache_metrics():
+    return jsonify(entities.stats())
+
+
+@app.route("/metrics/stream", methods=["GET"])
+def stream_metrics():
+    return jsonify(hub.stats())
 
 
-CORS(app)
 @app.route("/getAreas", methods=["POST"])
 def getAreas():
-    data = request.json
-    icpserial = data["icpserial"]
-    session_id = data["session_id"]
-    areas_url = f"http://{icpserial}.local/api/v1/control/area"
-    headers = {
-        "Cookie": f"LoginSessId={session_id}"
-    }
-    areas_resp = requests.get(areas_url, headers=headers, timeout=5)
-    print("Areas status:", areas_resp.status_code)
-    print("Areas body:", areas_resp.text)
-    return jsonify(areas_resp.json())
+    client = current_client()
+    refresh = bool((request.get_json(silent=True) or {}).get("refresh"))
+    return jsonify(client.get_all_areas(revalidate=refresh))
+
+
+@app.route("/getAll", methods=["POST"])
+def getAll():
+    """Every config collection in one round trip from the browser, fetched concurrently upstream."""
+    client = current_client()
+    refresh = bool((request.get_json(silent=True) or {}).get("refresh"))
+    return jsonify(asdict(client.load_all(revalidate=refresh)))
+
+
+@app.route("/control", methods=["POST"])
+def control():
+    """
+    {"kind": "door" | "output", "action": "Unlock", "ids": [...] or "all"}
+    -> per-target results plus a summary. 207 if some targets failed or their outcome is unknown.
+    """
+    client = current_client()
+    data = request.get_json(silent=True) or {}
+    kind = data.get("kind", "door")
+    action = data.get("action")
+    ids = data.get("ids")
+    if kind not in ACTIVITIES or not action or not ids:
+        return jsonify({"success": False, "error": "need kind (door/output), action and ids"}), 400
+    if ids != "all" and not (isinstance(ids, list) and all(valid_target_id(i) for i in ids)):
+        return jsonify({"success": False, "error": "ids must be \"all\" or a list of door/output IDs"}), 400
+    if ids == "all":
+        ids = [entity["ID"] for entity in client.get_entities(kind + "s")]
+    t0 = time.perf_counter()
+    results = client.control_many(kind, action, ids)
+    report = dict(summary(results), total_ms=round((time.perf_counter() - t0) * 1000, 1))
+    print(f"Control {kind} {action}: {report}")
+    done = report["failed"] == 0 and report["unknown"] == 0
+    return jsonify({"success": done, "summary": report, "results": results}), 200 if done else 207
 
 
 #getAreas(API_ROOT, authenticate(API_ROOT))
@@ -0,0 +1,112 @@
+"""
+Send one control activity to many doors or outputs at once (lockdown, unlock-all).
+
+Activities go out concurrently over the client's pooled session, at most
+`concurrency` in flight (default: one per pooled socket) so the controller
+isn't flooded. Each target gets its own result with status and latency.
+A target is only sent again, in a later round with backoff, when the
+controller provably never acted on it: no connection could be made, or it
+answered 429 or 503. A read timeout, a connection dropped after the request
+went out, or any other 5xx may still have opened the door, so those are
+reported as ok: None ("unknown") rather than repeated. Refusals (other 4xx)
+are final failures.
+
+    results = control_many(client, "door", "Unlock", [door["ID"] for door in doors])
+    summary(results)    # {"ok": 22, "failed": 1, "unknown": 1, "retried": 1, "max_ms": 180.4}
+"""
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import inceptionclient
+
+RETRIES = 2             # extra rounds for transient failures
+BACKOFF_S = 0.2         # doubled each round
+
+# kind -> (API path, activity Type, control type field)
+ACTIVITIES = {
+    "door": ("control/door", "ControlDoor", "DoorControlType"),
+    "output": ("control/output", "ControlOutput", "OutputControlType"),
+}
+RETRY_STATUS = (429, 503)     # refused before acting; safe to send again
+OUTCOMES = {True: "ok", False: "failed", None: "unknown"}
+TARGET_ID = re.compile(r"[A-Za-z0-9_-]+")       # controller GUIDs; goes into the URL path as-is
+
+
+def valid_target_id(value):
+    """A door/output ID is a non-empty string of GUID characters, or an int."""
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, str) and TARGET_ID.fullmatch(value) is not None)
+
+
+def activity_body(kind, action):
+    _, activity_type, control_field = ACTIVITIES[kind]
+    return {"Type": activity_type, control_field: action}
+
+
+def _send(client, kind, action, target_id):
+    """(result, retry) for one activity; result["ok"] is None if it may or may not have been carried out."""
+    path = f"{ACTIVITIES[kind][0]}/{target_id}/activity"
+    t0 = time.perf_counter()
+    try:
+        response = client.request("POST", path, json=activity_body(kind, action))
+        status, error = response.status_code, None
+        if status >= 400:
+            error = response.text[:200] or response.reason
+        retry = status in RETRY_STATUS
+        ok = True if status < 400 else None if status >= 500 and not retry else False
+    except (requests.ConnectionError, requests.Timeout) as e:
+        status, error = None, str(e)
+        retry = inceptionclient.never_sent(e)
+        ok = False if retry else None
+    result = {"id": target_id, "ok": ok, "outcome": OUTCOMES[ok], "status": status, "error": error,
+              "ms": round((time.perf_counter() - t0) * 1000, 1)}
+    return result, retry
+
+
+def control_many(client, kind, action, target_ids, concurrency=None, retries=RETRIES,
+                 backoff=BACKOFF_S):
+    """
+    Sends `action` ("Unlock", "Lock", "On", ...) to every door or output in
+    target_ids. Returns one result per target, in the order given:
+    {"id", "ok", "outcome", "status", "error", "ms", "attempts"}, where ok is
+    True, False, or None when the outcome is unknown.
+    """
+    if kind not in ACTIVITIES:
+        raise ValueError(f"unknown kind {kind!r}, expected one of {sorted(ACTIVITIES)}")
+    bad = [t for t in target_ids if not valid_target_id(t)]
+    if bad:
+        raise ValueError(f"invalid target ids: {bad[:5]!r}")
+    results = {}
+    pending = list(dict.fromkeys(target_ids))      # a target listed twice is still sent once
+    attempts = dict.fromkeys(pending, 0)
+    workers = max(1, min(concurrency or client.pool_size, len(pending)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"control-{kind}") as pool:
+        for round_no in range(retries + 1):
+            if not pending:
+                break
+            if round_no:
+                time.sleep(backoff * 2 ** (round_no - 1))
+            retry = []
+            for target_id, (result, transient) in zip(
+                    pending, pool.map(lambda t: _send(client, kind, action, t), pending)):
+                attempts[target_id] += 1
+                results[target_id] = dict(result, attempts=attempts[target_id])
+                if transient:
+                    retry.append(target_id)
+            pending = retry
+    return [results[t] for t in attempts]
+
+
+def summary(results):
+    ms = sorted(r["ms"] for r in results)
+    return {
+        "ok": sum(r["ok"] is True for r in results),
+        "failed": sum(r["ok"] is False for r in results),
+        "unknown": sum(r["ok"] is None for r in results),
+        "retried": sum(r["attempts"] > 1 for r in results),
+        "max_ms": ms[-1] if ms else None,
+    }
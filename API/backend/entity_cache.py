@@ -0,0 +1,106 @@
+"""
+Shared cache for Inception configuration entities (areas, doors, inputs, outputs, users).
+
+Names, IDs and ReportingIDs change only when someone edits the controller's
+programming, so each list is kept for a per-type TTL and served without a
+request while fresh. Once expired it is revalidated with If-None-Match /
+If-Modified-Since when the controller sent an ETag / Last-Modified, so an
+unchanged list costs a 304 with no body. Live state (armed, open, on) is not
+cached here; it comes from StateMonitor.
+
+Entries are keyed by controller and user, so one cache can sit under every
+pooled InceptionClient. Concurrent misses for the same list share one fetch.
+
+    cache = EntityCache(ttls={"areas": 300})
+    client = InceptionClient("in67434072.local", cache=cache)
+    client.get_entities("areas")                  # fetch
+    client.get_entities("areas")                  # from memory
+    client.get_entities("areas", revalidate=True) # conditional GET
+"""
+import threading
+import time
+
+ENTITY_PATHS = {
+    "areas": "control/area",
+    "doors": "control/door",
+    "inputs": "control/input",
+    "outputs": "control/output",
+    "users": "config/user",
+}
+DEFAULT_TTLS = {
+    "areas": 300,
+    "doors": 300,
+    "inputs": 600,
+    "outputs": 600,
+    "users": 120,
+}
+
+
+class EntityCache:
+    def __init__(self, ttls=None):
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.lock = threading.Lock()
+        self.entries = {}       # (host, user, coll) -> {"data", "etag", "last_modified", "at"}
+        self.key_locks = {}
+        self.counters = {"hits": 0, "fetched": 0, "not_modified": 0, "errors": 0}
+
+    def get(self, client, coll, revalidate=False):
+        key = (client.host, client.username, coll)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and not revalidate and time.monotonic() - entry["at"] < self.ttls[coll]:
+                self.counters["hits"] += 1
+                return entry["data"]
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self.lock:
+                latest = self.entries.get(key)
+            # someone else refreshed it while we waited
+            if latest is not entry and latest is not None:
+                with self.lock:
+                    self.counters["hits"] += 1
+                return latest["data"]
+            return self._fetch(client, coll, key, entry)
+
+    def _fetch(self, client, coll, key, entry):
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = client.request("GET", ENTITY_PATHS[coll], headers=headers)
+            if response.status_code == 304 and entry is not None:
+                fresh = dict(entry, at=time.monotonic())
+                counter = "not_modified"
+            else:
+                response.raise_for_status()
+                fresh = {
+                    "data": response.json(),
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "at": time.monotonic(),
+                }
+                counter = "fetched"
+        except Exception:
+            with self.lock:
+                self.counters["errors"] += 1
+            if entry is not None:
+                return entry["data"]    # controller unreachable: old config beats no config
+            raise
+        with self.lock:
+            self.entries[key] = fresh
+            self.counters[counter] += 1
+        return fresh["data"]
+
+    def invalidate(self, host=None, coll=None):
+        with self.lock:
+            for key in [k for k in self.entries
+                        if (host is None or k[0] == host) and (coll is None or k[2] == coll)]:
+                del self.entries[key]
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, entries=len(self.entries))
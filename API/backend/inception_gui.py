@@ -1,8 +1,14 @@
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 import requests
+from bulk_control import summary
+from entity_cache import EntityCache
 from inceptionclient import InceptionClient
 
+# kept across logins; Refresh buttons revalidate (a 304 when nothing changed)
+entity_cache = EntityCache()
+
 
 
 class InceptionGUI:
@@ -14,6 +20,7 @@ class InceptionGUI:
         self.root.geometry("400x700")
         
         self.client = None  # Will hold InceptionClient after login
+        self.monitor = None  # Live area/door state (long-poll), started after login
         
         self.create_widgets()
         self.do_login()
@@ -82,6 +89,8 @@ class InceptionGUI:
         self.outputs_combo.bind("<<ComboboxSelected>>", self.on_output_selected)
 
         ttk.Button(outputs_frame, text="Unlock Door", command=self.on_unlockbtn).pack()
+        ttk.Button(outputs_frame, text="Unlock All Doors", command=lambda: self.control_all_doors("Unlock")).pack()
+        ttk.Button(outputs_frame, text="Lock All Doors", command=lambda: self.control_all_doors("Lock")).pack()
         
         # Store the actual data (not just names)
         self.areas_data = []
@@ -94,20 +103,59 @@ class InceptionGUI:
         password = self.password_entry.get()
         
         try:
-            self.client = InceptionClient(serial)
+            if self.monitor:
+                self.monitor.stop()
+            self.client = InceptionClient(serial, cache=entity_cache)
             session_id = self.client.login(username, password)
+            # called on the monitor thread; hop to Tk before touching widgets
+            self.monitor = self.client.monitor(
+                on_change=lambda coll, changed: self.root.after(0, self.on_state_changed, coll))
             
             self.status_label.config(text=f"Connected! Session: {session_id[:8]}...", foreground="green")
             # messagebox.showinfo("Success", "Login successful!")
             
-            # Auto-load areas and outputs after login
-            self.load_areas()
-            self.load_outputs()
+            # Auto-load everything at once, off the Tk thread
+            threading.Thread(target=self.load_everything, args=(self.client,), daemon=True).start()
             
         except Exception as e:
             self.status_label.config(text="Connection failed", foreground="red")
             messagebox.showerror("Error", f"Login failed:\n{str(e)}")
     
+    def load_everything(self, client):
+        """Runs on a worker thread: one concurrent load_all(), then back to Tk to fill the combos."""
+        snapshot = client.load_all(revalidate=True)
+        print(f"Initial load {snapshot.total_ms} ms: {snapshot.timings_ms}")
+        self.root.after(0, self.apply_snapshot, client, snapshot)
+
+    def apply_snapshot(self, client, snapshot):
+        if client is not self.client:
+            return      # logged in again while this was loading
+        if "areas" not in snapshot.errors:
+            self.show_areas(snapshot.areas)
+        if "doors" not in snapshot.errors:
+            self.show_outputs(snapshot.doors)
+        if snapshot.errors:
+            messagebox.showerror("Error", "Failed to load:\n" +
+                                 "\n".join(f"{coll}: {e}" for coll, e in snapshot.errors.items()))
+
+    def show_areas(self, areas):
+        self.areas_data = areas
+        area_names = [area["Name"] for area in self.areas_data]
+        self.areas_combo["values"] = area_names
+
+        if area_names:
+            self.areas_combo.current(0)
+            self.on_area_selected(None)
+
+    def show_outputs(self, outputs):
+        self.outputs_data = outputs
+        output_names = [output["Name"] for output in self.outputs_data]
+        self.outputs_combo["values"] = output_names
+
+        if output_names:
+            self.outputs_combo.current(0)
+            self.on_output_selected(None)
+
     def load_areas(self):
         """Fetch and display areas"""
         if not self.client:
@@ -115,14 +163,7 @@ class InceptionGUI:
             return
         
         try:
-            self.areas_data = self.client.get_all_areas()
-            area_names = [area["Name"] for area in self.areas_data]
-            self.areas_combo["values"] = area_names
-            
-            if area_names:
-                self.areas_combo.current(0)
-                self.on_area_selected(None)
-                
+            self.show_areas(self.client.get_all_areas(revalidate=True))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load areas:\n{str(e)}")
     
@@ -133,14 +174,7 @@ class InceptionGUI:
             return
         
         try:
-            self.outputs_data = self.client.get_doors()
-            output_names = [output["Name"] for output in self.outputs_data]
-            self.outputs_combo["values"] = output_names
-            
-            if output_names:
-                self.outputs_combo.current(0)
-                self.on_output_selected(None)
-                
+            self.show_outputs(self.client.get_doors(revalidate=True))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load outputs:\n{str(e)}")
     
@@ -153,7 +187,8 @@ class InceptionGUI:
             self.area_details.delete("1.0", tk.END)
             self.area_details.insert(tk.END, f"Name: {area.get('Name')}\n")
             self.area_details.insert(tk.END, f"ID: {area.get('ID')}\n")
-            self.area_details.insert(tk.END, f"ReportingID: {area.get('ReportingID')}")
+            self.area_details.insert(tk.END, f"ReportingID: {area.get('ReportingID')}\n")
+            self.area_details.insert(tk.END, f"State: {self.live_state('areas', area)}")
     
     def on_output_selected(self, event):
         """When user selects an output, show its details"""
@@ -164,7 +199,21 @@ class InceptionGUI:
             self.output_details.delete("1.0", tk.END)
             self.output_details.insert(tk.END, f"Name: {output.get('Name')}\n")
             self.output_details.insert(tk.END, f"ID: {output.get('ID')}\n")
-            self.output_details.insert(tk.END, f"ReportingID: {output.get('ReportingID')}")
+            self.output_details.insert(tk.END, f"ReportingID: {output.get('ReportingID')}\n")
+            self.output_details.insert(tk.END, f"State: {self.live_state('doors', output)}")
+
+    def live_state(self, coll, entity):
+        if not self.monitor:
+            return "-"
+        state = self.monitor.state[coll].get(str(entity.get("ID")))
+        return state.get("stateValue") if state else "-"
+
+    def on_state_changed(self, coll):
+        """Refresh only the details box whose collection changed; no refetch."""
+        if coll == "areas":
+            self.on_area_selected(None)
+        elif coll == "doors":
+            self.on_output_selected(None)
 
     def on_unlockbtn(self):
         index = self.outputs_combo.current()           # Get the index (0, 1, 2...)
@@ -172,6 +221,25 @@ class InceptionGUI:
         door_id = door["ID"]                           # Get the actual GUID
         self.client.control_output(door_id)  
 
+    def control_all_doors(self, action):
+        """Every loaded door at once, on a worker thread; the result lands in the status label."""
+        if not self.client:
+            messagebox.showwarning("Warning", "Please login first")
+            return
+        client, door_ids = self.client, [door["ID"] for door in self.outputs_data]
+
+        def run():
+            report = summary(client.control_many("door", action, door_ids))
+            self.root.after(0, self.show_control_report, action, report)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def show_control_report(self, action, report):
+        text = (f"{action}: {report['ok']} ok, {report['failed']} failed, {report['unknown']} unknown"
+                f" ({report['max_ms']} ms slowest)")
+        ok = not report["failed"] and not report["unknown"]
+        self.status_label.config(text=text, foreground="green" if ok else "red")
+
 
 
 # Run the application
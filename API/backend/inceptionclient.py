@@ -1,49 +1,338 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+import bulk_control
+from entity_cache import ENTITY_PATHS
+
+# Inception answers these when LoginSessId has expired or been revoked
+SESSION_EXPIRED = (401, 403)
+
+# replica collection -> monitor-updates stateType
+STATE_TYPES = {
+    "areas": "AreaState",
+    "doors": "DoorState",
+    "inputs": "InputState",
+    "outputs": "OutputState",
+}
+LONG_POLL_S = 60        # controller holds monitor-updates open up to about this long
+# safe to send twice: a dropped connection may have carried them to the controller already
+IDEMPOTENT = ("GET", "HEAD", "OPTIONS")
+
+
+def never_sent(error):
+    """True if a requests error means no connection was made, so the controller can't have acted on it."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    reason = getattr(reason, "reason", reason)      # urllib3's MaxRetryError wraps the cause
+    return isinstance(reason, NewConnectionError)
+
+
+@dataclass
+class EntitySnapshot:
+    """Every configuration collection from one load_all(), with per-endpoint timings."""
+    areas: list = field(default_factory=list)
+    doors: list = field(default_factory=list)
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    users: list = field(default_factory=list)
+    timings_ms: dict = field(default_factory=dict)   # collection -> ms for its request
+    errors: dict = field(default_factory=dict)       # collection -> error, for the ones that failed
+    total_ms: float = 0.0
+
 
 class InceptionClient:
-    def __init__(self, serial):
+    def __init__(self, serial, timeout=5, pool_size=len(ENTITY_PATHS) + 1, resolver=None, cache=None):
         self.base_url = f"http://{serial}/api/v1"
+        self.host = serial
+        self.resolver = resolver    # resolver.HostResolver: skip a .local lookup per connection
+        self.cache = cache          # entity_cache.EntityCache: config lists served from memory
         self.session_id = None
+        self.username = None
+        self.password = None
+        self.login_lock = threading.Lock()     # one re-login at a time when a session expires under load
+        self.timeout = timeout
+        self.pool_size = pool_size
         self.http = requests.Session()
+        # keep-alive sockets to the controller, shared by every call on this client;
+        # the default fits a concurrent load_all() plus one monitor long-poll
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+        if resolver is not None:
+            self.http.headers.update({"Host": serial})
+
+    def _url(self, path):
+        if self.resolver is None:
+            return f"{self.base_url}/{path}"
+        name, sep, port = self.host.partition(":")
+        return f"http://{self.resolver.resolve(name)}{sep}{port}/api/v1/{path}"
+
+    def _send(self, method, path, session_id=None, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        if session_id is not None:
+            # pin the cookie this call was made with, so request() knows which session a 401 refers to
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, Cookie=f"LoginSessId={session_id}")
+        try:
+            return self.http.request(method, self._url(path), **kwargs)
+        except requests.ConnectionError as e:
+            # a reset after the body went out may mean a door already moved: only
+            # resend when nothing reached the controller, or the call is a read
+            if self.resolver is None or not (never_sent(e) or method.upper() in IDEMPOTENT):
+                raise
+            # the controller may have a new address; look it up again before giving up
+            self.resolver.invalidate(self.host.partition(":")[0])
+            return self.http.request(method, self._url(path), **kwargs)
 
     def login(self, username, password):
-        url = f"{self.base_url}/authentication/login"
-        response = self.http.post(url, json={
+        response = self._send("POST", "authentication/login", json={
             "Username": username,
             "Password": password
         })
         data = response.json()
+        if not data.get("UserID"):
+            raise PermissionError(f"login refused ({response.status_code}): {response.text}")
         self.session_id = data["UserID"]
+        self.username = username
+        self.password = password
         self.http.headers.update({"Cookie": f"LoginSessId={self.session_id}"})
         return self.session_id
-    
+
+    def request(self, method, path, **kwargs):
+        """
+        Calls the API, logging in again once if the session has expired. When
+        several threads hit the expiry together only the first logs in; the
+        rest see the session id has changed and just retry with the new one.
+        """
+        session_id = self.session_id
+        response = self._send(method, path, session_id=session_id, **kwargs)
+        if response.status_code in SESSION_EXPIRED and self.username is not None:
+            with self.login_lock:
+                if self.session_id == session_id:
+                    self.login(self.username, self.password)
+                session_id = self.session_id
+            response = self._send(method, path, session_id=session_id, **kwargs)
+        return response
+
     def get_headers(self):
         return {"Cookie": f"LoginSessId={self.session_id}"}
-    
-    def get_all_areas(self):
-        url = f"{self.base_url}/control/area"
-        response = self.http.get(url)
+
+    def get_entities(self, coll, revalidate=False):
+        """Configuration list for "areas", "doors", "inputs", "outputs" or "users", through the cache if there is one."""
+        if self.cache is not None:
+            return self.cache.get(self, coll, revalidate=revalidate)
+        response = self.request("GET", ENTITY_PATHS[coll])
+        response.raise_for_status()
+        return response.json()
+
+    def get_all_areas(self, revalidate=False):
+        if self.cache is not None:
+            return self.get_entities("areas", revalidate)
+        response = self.request("GET", "control/area")
         print("=" * 50)
         print("RAW RESPONSE:")
         print(f"Status Code: {response.status_code}")
         print(f"Response Text: {response.text}")
         print("=" * 50)
         return response.json()
-        
-    def get_doors(self):
-        url = f"{self.base_url}/control/door"
-        response = self.http.get(url)
-        return response.json()
-    
+
+    def get_doors(self, revalidate=False):
+        return self.get_entities("doors", revalidate)
+
+    def get_inputs(self, revalidate=False):
+        return self.get_entities("inputs", revalidate)
+
+    def get_outputs(self, revalidate=False):
+        return self.get_entities("outputs", revalidate)
+
     def control_output(self, output_id):
-        url = f"{self.base_url}/control/door/{output_id}/activity"
-        body = {
-            "Type": "ControlDoor",
-            "DoorControlType": "Lock",
-        }
-        response = self.http.post(url,json= body)
+        body = bulk_control.activity_body("door", "Lock")
+        response = self.request("POST", f"control/door/{output_id}/activity", json=body)
         print({response.status_code, response.text})
         return response.json()
-    
 
-    
\ No newline at end of file
+    def control_many(self, kind, action, target_ids, **kwargs):
+        """Same activity to many doors ("door") or outputs ("output") at once; see bulk_control."""
+        return bulk_control.control_many(self, kind, action, target_ids, **kwargs)
+
+    def _timed_get(self, coll, revalidate):
+        t0 = time.perf_counter()
+        try:
+            return coll, self.get_entities(coll, revalidate), None, (time.perf_counter() - t0) * 1000
+        except Exception as e:
+            return coll, [], str(e), (time.perf_counter() - t0) * 1000
+
+    @staticmethod
+    def _snapshot(results, t0):
+        snap = EntitySnapshot(total_ms=(time.perf_counter() - t0) * 1000)
+        for coll, data, error, ms in results:
+            setattr(snap, coll, data)
+            snap.timings_ms[coll] = round(ms, 1)
+            if error is not None:
+                snap.errors[coll] = error
+        snap.total_ms = round(snap.total_ms, 1)
+        return snap
+
+    def load_all(self, collections=tuple(ENTITY_PATHS), revalidate=False):
+        """
+        Fetches every collection at once over the pooled session. A failing
+        endpoint leaves its list empty and is reported in snapshot.errors.
+        """
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(collections), thread_name_prefix="load-all") as pool:
+            results = list(pool.map(lambda c: self._timed_get(c, revalidate), collections))
+        return self._snapshot(results, t0)
+
+    async def load_all_async(self, collections=tuple(ENTITY_PATHS), revalidate=False):
+        """load_all() for asyncio callers; the blocking requests run on the default executor."""
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(asyncio.to_thread(self._timed_get, c, revalidate)
+                                         for c in collections))
+        return self._snapshot(results, t0)
+
+    def monitor_updates(self, cursors, timeout=LONG_POLL_S + 10):
+        """
+        One long-poll on /monitor-updates. cursors: {stateType: timeSinceUpdate}
+        ("0" for a full first read). Returns a list of (stateType, updateTime,
+        stateData), one per stateType that changed; empty if the controller had
+        nothing new before it let the poll go.
+        """
+        body = [{
+            "ID": state_type,
+            "RequestType": "MonitorEntityStates",
+            "InputData": {"stateType": state_type, "timeSinceUpdate": str(since)},
+        } for state_type, since in cursors.items()]
+        response = self.request("POST", "monitor-updates", json=body, timeout=timeout)
+        if response.status_code == 204 or not response.content:
+            return []
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, list):
+            data = [data]
+        return [(item["ID"], item["Result"].get("updateTime", 0), item["Result"].get("stateData") or [])
+                for item in data if item and item.get("Result")]
+
+    def monitor(self, on_change=None, collections=tuple(STATE_TYPES), on_status=None):
+        """Starts a StateMonitor on this client; see StateMonitor."""
+        monitor = StateMonitor(self, on_change=on_change, collections=collections, on_status=on_status)
+        monitor.start()
+        return monitor
+
+    def close(self):
+        self.http.close()
+
+
+class StateMonitor:
+    """
+    Local replica of area/door/input/output state kept current by long-polling.
+
+    One background thread holds a single /monitor-updates request open. Each
+    answer carries the new updateTime for its stateType, so the next poll only
+    returns later changes. Entities that differ from the replica are passed to
+    on_change(collection, [entity, ...]) and to every updates() iterator.
+    on_status(error) is called when polling starts failing (error text) or
+    recovers (None).
+
+        monitor = client.monitor(on_change=lambda coll, changed: print(coll, changed))
+        monitor.state["areas"]["<guid>"]["stateValue"]
+
+        async for coll, entity in monitor.updates():
+            ...
+    """
+
+    def __init__(self, client, on_change=None, collections=tuple(STATE_TYPES), on_status=None):
+        self.client = client
+        self.on_change = on_change
+        self.on_status = on_status
+        self.by_type = {STATE_TYPES[c]: c for c in collections}
+        self.cursors = {t: "0" for t in self.by_type}
+        self.state = {c: {} for c in collections}
+        self.lock = threading.Lock()
+        self.listeners = set()      # (loop, asyncio.Queue) per updates() iterator
+        self.stopping = False
+        self.error = None
+        self.polls = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="inception-monitor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """The thread exits after the poll in flight returns (at most LONG_POLL_S)."""
+        self.stopping = True
+
+    def snapshot(self):
+        with self.lock:
+            return {c: dict(items) for c, items in self.state.items()}
+
+    def _run(self):
+        backoff = 1.0
+        while not self.stopping:
+            try:
+                updates = self.client.monitor_updates(self.cursors)
+                self.polls += 1
+                self._set_error(None)
+                backoff = 1.0
+            except Exception as e:
+                self._set_error(str(e))
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+            for update in updates:
+                self._apply(*update)
+
+    def _set_error(self, error):
+        if error == self.error:
+            return
+        self.error = error
+        if self.on_status is not None:
+            try:
+                self.on_status(error)
+            except Exception as e:
+                print("on_status error:", e)
+
+    def _apply(self, state_type, update_time, entities):
+        coll = self.by_type.get(state_type)
+        if coll is None:
+            return
+        changed = []
+        with self.lock:
+            self.cursors[state_type] = update_time
+            replica = self.state[coll]
+            for entity in entities:
+                key = str(entity.get("ID"))
+                if replica.get(key) != entity:
+                    replica[key] = entity
+                    changed.append(entity)
+            listeners = list(self.listeners)
+        if not changed:
+            return
+        if self.on_change is not None:
+            try:
+                self.on_change(coll, changed)
+            except Exception as e:
+                print("on_change error:", e)
+        for loop, q in listeners:
+            for entity in changed:
+                loop.call_soon_threadsafe(q.put_nowait, (coll, entity))
+
+    async def updates(self):
+        """Async iterator of (collection, entity) for every change from now on."""
+        q = asyncio.Queue()
+        listener = (asyncio.get_running_loop(), q)
+        with self.lock:
+            self.listeners.add(listener)
+        try:
+            while True:
+                yield await q.get()
+        finally:
+            with self.lock:
+                self.listeners.discard(listener)
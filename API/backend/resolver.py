@@ -0,0 +1,136 @@
+"""
+Cached hostname resolution for Inception controllers (<serial>.local).
+
+mDNS lookups through the system resolver can take hundreds of milliseconds,
+or the full fallback timeout when multicast is flaky, and requests does one
+per new connection. HostResolver keeps the last answer per host:
+
+  - fresh (younger than ttl): returned straight from the cache
+  - stale (younger than stale_ttl): returned at once, refreshed in the background
+  - missing, or older than stale_ttl: resolved inline, bounded by timeout
+
+A failed refresh keeps the stale address, so a controller that was reachable
+a minute ago stays reachable while mDNS is misbehaving. stats() reports hit
+counts and lookup latency percentiles.
+
+    resolver = HostResolver(ttl=60)
+    ip = resolver.resolve("in67434072.local")
+"""
+import ipaddress
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+TTL_S = 60
+STALE_TTL_S = 24 * 3600
+TIMEOUT_S = 3.0
+LATENCY_SAMPLES = 1000
+
+
+def is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+class HostResolver:
+    def __init__(self, ttl=TTL_S, stale_ttl=STALE_TTL_S, timeout=TIMEOUT_S, port=80):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.timeout = timeout
+        self.port = port
+        self.lock = threading.Lock()
+        self.cache = {}         # host -> (ip, resolved_at)
+        self.refreshing = set()
+        self.pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="resolve")
+
+        self.counters = {"fresh": 0, "stale": 0, "miss": 0, "failed": 0, "stale_on_error": 0}
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)   # seconds per real lookup
+        self.last = {}          # host -> {"ms", "ok", "at"}
+
+    def _lookup(self, host):
+        """Blocking system lookup, IPv4 first (controllers don't answer on v6 link-local reliably)."""
+        infos = socket.getaddrinfo(host, self.port, proto=socket.IPPROTO_TCP)
+        infos.sort(key=lambda i: i[0] != socket.AF_INET)
+        return infos[0][4][0]
+
+    def _timed_lookup(self, host):
+        t0 = time.perf_counter()
+        ok = False
+        try:
+            ip = self.pool.submit(self._lookup, host).result(timeout=self.timeout)
+            ok = True
+            with self.lock:
+                self.cache[host] = (ip, time.monotonic())
+            return ip
+        finally:
+            elapsed = time.perf_counter() - t0
+            with self.lock:
+                self.latencies.append(elapsed)
+                self.last[host] = {"ms": round(elapsed * 1000, 2), "ok": ok, "at": time.time()}
+                if not ok:
+                    self.counters["failed"] += 1
+
+    def _refresh(self, host):
+        try:
+            self._timed_lookup(host)
+        except (OSError, FutureTimeout):
+            pass    # keep serving the stale address
+        finally:
+            with self.lock:
+                self.refreshing.discard(host)
+
+    def resolve(self, host):
+        """Returns an IP address for host (IP literals pass through). Raises OSError if it can't."""
+        if is_ip(host):
+            return host
+        now = time.monotonic()
+        with self.lock:
+            entry = self.cache.get(host)
+            if entry is not None:
+                ip, at = entry
+                age = now - at
+                if age < self.ttl:
+                    self.counters["fresh"] += 1
+                    return ip
+                if age < self.stale_ttl:
+                    self.counters["stale"] += 1
+                    if host not in self.refreshing:
+                        self.refreshing.add(host)
+                        threading.Thread(target=self._refresh, args=(host,), daemon=True).start()
+                    return ip
+            self.counters["miss"] += 1
+
+        try:
+            return self._timed_lookup(host)
+        except (OSError, FutureTimeout) as e:
+            if entry is not None:
+                with self.lock:
+                    self.counters["stale_on_error"] += 1
+                return entry[0]
+            raise OSError(f"could not resolve {host}: {str(e) or 'timed out'}") from e
+
+    def invalidate(self, host):
+        """After a connection error: the next resolve looks host up inline, falling back to the old address."""
+        with self.lock:
+            entry = self.cache.get(host)
+            if entry is not None:
+                self.cache[host] = (entry[0], time.monotonic() - self.stale_ttl)
+
+    def stats(self):
+        with self.lock:
+            lat = sorted(self.latencies)
+            hosts = {h: {"ip": ip, "age_s": round(time.monotonic() - at, 1), **self.last.get(h, {})}
+                     for h, (ip, at) in self.cache.items()}
+            counters = dict(self.counters)
+
+        def pct(p):
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))] * 1000, 2) if lat else None
+
+        return {**counters, "lookups": len(lat), "p50_ms": pct(0.5), "p99_ms": pct(0.99),
+                "max_ms": round(lat[-1] * 1000, 2) if lat else None, "hosts": hosts}
@@ -0,0 +1,132 @@
+"""
+Warm InceptionClient sessions for the Flask backend, keyed by controller serial.
+
+The browser gets an opaque token from /login instead of the controller's
+LoginSessId. Each token maps to one pooled client (serial + username), which
+keeps its keep-alive sockets and logs in again by itself when the controller
+expires the session. Clients idle for longer than idle_ttl are closed by a
+background reaper every REAP_INTERVAL_S, even when nobody is logging in.
+Whenever a client is closed (reaped, replaced by a new login, or on close())
+every callback in on_close is called with its (serial, username) and client.
+
+    pool = SessionPool()
+    token = pool.login("in67434072", "AccessOS", "AccessOS")
+    client = pool.get(token)            # None if unknown or expired
+    client.get_all_areas()
+    pool.on_close.append(lambda key, client: print("session ended", key))
+"""
+import secrets
+import threading
+import time
+
+from inceptionclient import InceptionClient
+from entity_cache import EntityCache
+from resolver import HostResolver
+
+IDLE_TTL_S = 30 * 60
+REAP_INTERVAL_S = 60
+
+
+def controller_host(serial):
+    return serial if "." in serial or ":" in serial else f"{serial}.local"
+
+
+class SessionPool:
+    def __init__(self, idle_ttl=IDLE_TTL_S, timeout=5, resolver=None, cache=None, reap_interval=REAP_INTERVAL_S):
+        self.idle_ttl = idle_ttl
+        self.timeout = timeout
+        self.resolver = resolver or HostResolver()
+        self.cache = cache or EntityCache()
+        self.lock = threading.Lock()
+        self.clients = {}       # (serial, username) -> InceptionClient
+        self.tokens = {}        # token -> (serial, username)
+        self.last_used = {}     # (serial, username) -> monotonic time
+        self.stop_event = threading.Event()
+        self.reap_interval = reap_interval
+        self.on_close = []      # callbacks(key, client) for each client closed
+        threading.Thread(target=self._reap_loop, name="session-reaper", daemon=True).start()
+
+    def _reap_loop(self):
+        while not self.stop_event.wait(self.reap_interval):
+            try:
+                self.reap()
+            except Exception as e:
+                print("session reap error:", e)
+
+    def login(self, serial, username, password):
+        """Logs in (reusing a warm client for the same controller and user) and returns a new token."""
+        key = (serial, username)
+        with self.lock:
+            client = self.clients.get(key)
+        if client is None or client.password != password:
+            # a wrong password must not replace a working session
+            candidate = InceptionClient(controller_host(serial), timeout=self.timeout, resolver=self.resolver,
+                                        cache=self.cache)
+            try:
+                candidate.login(username, password)
+            except Exception:
+                candidate.close()
+                raise
+            with self.lock:
+                old = self.clients.get(key)
+                self.clients[key] = candidate
+            if old is not None and old is not candidate:
+                self._close(key, old)
+            client = candidate
+
+        token = secrets.token_urlsafe(24)
+        with self.lock:
+            self.tokens[token] = key
+            self.last_used[key] = time.monotonic()
+        self.reap()
+        return token
+
+    def get(self, token):
+        with self.lock:
+            key = self.tokens.get(token)
+            if key is None or key not in self.clients:
+                return None
+            self.last_used[key] = time.monotonic()
+            return self.clients[key]
+
+    def key_for(self, token):
+        """(serial, username) behind token, or None."""
+        with self.lock:
+            return self.tokens.get(token)
+
+    def logout(self, token):
+        with self.lock:
+            self.tokens.pop(token, None)
+
+    def reap(self):
+        """Closes clients nobody has used for idle_ttl, and forgets their tokens."""
+        now = time.monotonic()
+        with self.lock:
+            idle = [k for k, t in self.last_used.items() if now - t > self.idle_ttl]
+            closed = [(k, self.clients.pop(k)) for k in idle if k in self.clients]
+            for k in idle:
+                del self.last_used[k]
+            self.tokens = {t: k for t, k in self.tokens.items() if k not in idle}
+        for key, client in closed:
+            self._close(key, client)
+
+    def _close(self, key, client):
+        for callback in list(self.on_close):
+            try:
+                callback(key, client)
+            except Exception as e:
+                print("on_close error:", e)
+        client.close()
+
+    def stats(self):
+        with self.lock:
+            return {"clients": len(self.clients), "tokens": len(self.tokens)}
+
+    def close(self):
+        """Stops the reaper and closes every client."""
+        self.stop_event.set()
+        with self.lock:
+            clients = list(self.clients.items())
+            self.clients, self.tokens, self.last_used = {}, {}, {}
+        for key, client in clients:
+            self._close(key, client)
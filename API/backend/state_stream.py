@@ -0,0 +1,218 @@
+"""
+Live controller state for any number of dashboards from one upstream long-poll.
+
+StreamHub keeps one ControllerMonitor per controller and user (serial,
+username), so a tab only ever sees what its own user's session fetched. A
+monitor reads the area and door configuration once (through the client's
+EntityCache) and runs a StateMonitor on the client, which holds a single
+/monitor-updates long-poll open and reports only entities whose state
+changed. Each change is merged with its configuration (Name, ReportingID)
+and pushed to every subscriber's queue. A new subscriber first gets a full
+snapshot; one that can't keep up (queue full) is sent "resync" and dropped,
+and the browser reconnects for a fresh snapshot. The long-poll stops
+IDLE_STOP_S after the last tab closes, and drop() ends a monitor at once
+when its session is closed.
+
+    hub = StreamHub()
+    q = hub.subscribe((serial, username), client)   # client: a logged-in InceptionClient
+    event, data = q.get()       # ("snapshot", {...}), then ("delta", {...}) / ("status", {...})
+    hub.unsubscribe((serial, username), q)
+"""
+import queue
+import threading
+
+QUEUE_SIZE = 100
+IDLE_STOP_S = 30.0      # keep the long-poll open this long after the last tab closes, for quick reloads
+CONFIG_RETRY_S = 5.0
+
+# collections streamed to dashboards; each is an EntityCache collection and a StateMonitor collection
+COLLECTIONS = ("areas", "doors")
+
+
+class ControllerMonitor:
+    def __init__(self, key, client, collections=COLLECTIONS):
+        self.key = key
+        self.client = client
+        self.collections = collections
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.config = None          # coll -> {id: configuration object}, once loaded
+        self.state_monitor = None
+        self.error = None
+        self.stopping = False
+        self.stop_event = threading.Event()
+        self.idle_timer = None
+        self.updates = 0
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"monitor-{self.key[0]}", daemon=True).start()
+
+    def _load_config(self, revalidate=False):
+        return {coll: {str(obj.get("ID")): obj for obj in self.client.get_entities(coll, revalidate)}
+                for coll in self.collections}
+
+    def _run(self):
+        while not self.stopping:
+            try:
+                config = self._load_config()
+                break
+            except Exception as e:
+                self._on_status(str(e))
+                self.stop_event.wait(CONFIG_RETRY_S)
+        else:
+            return
+        with self.lock:
+            if self.stopping:
+                return
+            self.config = config
+            self._publish("snapshot", self._snapshot())
+        monitor = self.client.monitor(on_change=self._on_change, collections=self.collections,
+                                      on_status=self._on_status)
+        with self.lock:
+            self.state_monitor = monitor
+            if self.stopping:
+                monitor.stop()
+
+    def _merged(self, coll, key, state):
+        obj = dict(self.config[coll].get(key) or {"ID": key})
+        obj["State"] = state
+        return obj
+
+    def _snapshot(self):
+        """Called with the lock held."""
+        live = self.state_monitor.snapshot() if self.state_monitor else {}
+        out = {}
+        for coll in self.collections:
+            states = live.get(coll, {})
+            out[coll] = {k: self._merged(coll, k, states.get(k)) for k in set(self.config[coll]) | set(states)}
+        return out
+
+    def _on_change(self, coll, changed):
+        """From the StateMonitor thread."""
+        if self.stopping:
+            return
+        if any(str(e.get("ID")) not in self.config[coll] for e in changed):
+            # programming changed on the controller; a 304 if it hasn't
+            try:
+                config = self._load_config(revalidate=True)
+                with self.lock:
+                    self.config = config
+            except Exception as e:
+                print("config reload failed:", e)
+        with self.lock:
+            self.updates += 1
+            delta = {str(e.get("ID")): self._merged(coll, str(e.get("ID")), e) for e in changed}
+            self._publish("delta", {"changed": {coll: delta}})
+
+    def _on_status(self, error):
+        with self.lock:
+            if error != self.error:
+                self.error = error
+                self._publish("status", {"ok": error is None, "error": error})
+
+    def subscribe(self):
+        """A queue of (event, data), or None if this monitor is already stopping."""
+        q = queue.Queue(maxsize=QUEUE_SIZE)
+        with self.lock:
+            if self.stopping:
+                return None
+            self.subscribers.add(q)
+            if self.idle_timer is not None:
+                self.idle_timer.cancel()
+                self.idle_timer = None
+            if self.config is not None:
+                q.put(("snapshot", self._snapshot()))
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.discard(q)
+            if not self.subscribers and not self.stopping and self.idle_timer is None:
+                self.idle_timer = threading.Timer(IDLE_STOP_S, self._stop_if_idle)
+                self.idle_timer.daemon = True
+                self.idle_timer.start()
+
+    def _stop_if_idle(self):
+        with self.lock:
+            self.idle_timer = None
+            if self.subscribers:
+                return
+        self.stop()
+
+    def stop(self):
+        """Ends the long-poll; open streams are told to reconnect (and meet a 401 if the session is gone)."""
+        with self.lock:
+            if self.stopping:
+                return
+            self.stopping = True
+            self.stop_event.set()
+            if self.idle_timer is not None:
+                self.idle_timer.cancel()
+                self.idle_timer = None
+            for q in self.subscribers:
+                try:
+                    q.put_nowait(("resync", {}))
+                except queue.Full:
+                    pass
+            self.subscribers.clear()
+            monitor = self.state_monitor
+        if monitor is not None:
+            monitor.stop()
+
+    def _publish(self, event, data):
+        """Called with the lock held."""
+        for q in list(self.subscribers):
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                # too slow to follow deltas; make it reconnect for a fresh snapshot
+                self.subscribers.discard(q)
+                try:
+                    q.get_nowait()
+                    q.put_nowait(("resync", {}))
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+class StreamHub:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.monitors = {}      # (serial, username) -> ControllerMonitor
+
+    def subscribe(self, key, client):
+        while True:
+            with self.lock:
+                monitor = self.monitors.get(key)
+                if monitor is None or monitor.stopping or monitor.client is not client:
+                    # first tab, idle-stopped, or the pool replaced this user's client
+                    if monitor is not None:
+                        monitor.stop()
+                    monitor = ControllerMonitor(key, client)
+                    self.monitors[key] = monitor
+                    monitor.start()
+            q = monitor.subscribe()
+            if q is not None:
+                return q
+
+    def unsubscribe(self, key, q):
+        with self.lock:
+            monitor = self.monitors.get(key)
+        if monitor is not None:
+            monitor.unsubscribe(q)
+
+    def drop(self, key, client=None):
+        """Stops the monitor for key (only if it runs on client, when given): its session has ended."""
+        with self.lock:
+            monitor = self.monitors.get(key)
+            if monitor is None or (client is not None and monitor.client is not client):
+                return
+            del self.monitors[key]
+        monitor.stop()
+
+    def stats(self):
+        with self.lock:
+            monitors = dict(self.monitors)
+        return {f"{serial}/{username}": {"subscribers": len(m.subscribers), "updates": m.updates,
+                                         "polls": m.state_monitor.polls if m.state_monitor else 0,
+                                         "error": m.error, "running": not m.stopping}
+                for (serial, username), m in monitors.items()}
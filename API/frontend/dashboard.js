@@ -1,25 +1,91 @@
-const sessionId = sessionStorage.getItem("sessionId");
+const token = sessionStorage.getItem("token");
 const Device = sessionStorage.getItem("ICPSerial");
 const UserID = sessionStorage.getItem("Username")
 
-if (!sessionId) {
+if (!token) {
 
     window.location.href = "index.html";
 }
 
 
-document.getElementById("loginmsg").textContent = `Welcome, ${UserID}, Device: ${Device}, Session: ${sessionId}`;
+document.getElementById("loginmsg").textContent = `Welcome, ${UserID}, Device: ${Device}`;
 
 document.getElementById("getareasBtn").onclick = async function () {
     const response = await fetch("http://localhost:5000/getAreas", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-            session_id: sessionId,
-            icpserial: Device
-        })
+        headers: {
+            "Content-Type": "application/json",
+            "Authorization": `Bearer ${token}`
+        }
     });
 
+    if (response.status === 401) {
+        // backend restarted or the session was idle too long
+        sessionStorage.removeItem("token");
+        window.location.href = "index.html";
+        return;
+    }
     const areas = await response.json();
     console.log(areas);
-};
\ No newline at end of file
+};
+
+// Live state: the backend polls the controller once and pushes changes to every open tab
+const state = { areas: {}, doors: {} };
+
+function renderState() {
+    const list = document.getElementById("areasList");
+    list.innerHTML = "";
+    for (const coll of ["areas", "doors"]) {
+        for (const item of Object.values(state[coll])) {
+            const li = document.createElement("li");
+            const value = item.State?.stateValue ?? "?";
+            li.textContent = `${coll === "areas" ? "Area" : "Door"}: ${item.Name} (${item.ID}) - ${value}`;
+            list.appendChild(li);
+        }
+    }
+}
+
+function openStream() {
+    const source = new EventSource(`http://localhost:5000/stream?token=${encodeURIComponent(token)}`);
+
+    source.addEventListener("snapshot", (e) => {
+        const snap = JSON.parse(e.data);
+        state.areas = snap.areas || {};
+        state.doors = snap.doors || {};
+        renderState();
+    });
+
+    source.addEventListener("delta", (e) => {
+        const delta = JSON.parse(e.data);
+        for (const [coll, items] of Object.entries(delta.changed || {})) {
+            Object.assign(state[coll], items);
+        }
+        for (const [coll, ids] of Object.entries(delta.removed || {})) {
+            for (const id of ids) delete state[coll][id];
+        }
+        renderState();
+    });
+
+    source.addEventListener("status", (e) => {
+        const status = JSON.parse(e.data);
+        document.getElementById("loginmsg").textContent = status.ok
+            ? `Welcome, ${UserID}, Device: ${Device}`
+            : `Device: ${Device} unreachable: ${status.error}`;
+    });
+
+    source.onerror = () => {
+        // a 401 closes the stream for good; network errors leave it reconnecting by itself
+        if (source.readyState === EventSource.CLOSED) {
+            sessionStorage.removeItem("token");
+            window.location.href = "index.html";
+        }
+    };
+
+    source.addEventListener("resync", () => {
+        // fell behind; reconnect for a fresh snapshot
+        source.close();
+        openStream();
+    });
+}
+
+openStream();
@@ -41,8 +41,8 @@ document.getElementById("ICPLoginSubmit").onclick = async function () {
     const data = await response.json();
 
     if (data.success) {
-        // Store session
-        sessionStorage.setItem("sessionId", data.UserID);
+        // Store the backend's session token (the controller's LoginSessId stays on the server)
+        sessionStorage.setItem("token", data.Token);
         sessionStorage.setItem("ICPSerial", ICPSerial)
         sessionStorage.setItem("Username", APIUsername)
         window.location.href = "dashboard.html";
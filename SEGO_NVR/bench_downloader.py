@@ -0,0 +1,72 @@
+"""
+Downloader benchmark against a local static HTTP server (http.server), with
+per-request latency added to stand in for a remote site. Runs a cold download,
+a rerun that skips existing files, and a revalidating rerun (304s).
+
+    python bench_downloader.py --images 200 --delay-ms 50 --concurrency 8
+"""
+import argparse
+import asyncio
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from image_downloader import Downloader, urllib_fetch
+
+
+def serve(directory, delay):
+    class Handler(SimpleHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            return
+
+        def do_GET(self):
+            time.sleep(delay)
+            super().do_GET()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(Handler, directory=directory))
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def run(label, save, jobs, **kwargs):
+    dl = Downloader(save, urllib_fetch, verbose=False, **kwargs)
+    asyncio.run(dl.run(jobs))
+    print(f"{label:<14} {dl.summary()}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="image_downloader benchmark")
+    ap.add_argument("--images", type=int, default=200)
+    ap.add_argument("--image-kb", type=int, default=100)
+    ap.add_argument("--delay-ms", type=float, default=50.0, help="server latency per request")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--rate", type=float, default=0.0, help="per-host requests/s (0 = unlimited)")
+    args = ap.parse_args()
+
+    site = tempfile.mkdtemp()
+    save = tempfile.mkdtemp()
+    for i in range(args.images):
+        with open(os.path.join(site, f"{i}.jpg"), "wb") as f:
+            f.write(os.urandom(args.image_kb * 1024))
+    httpd = serve(site, args.delay_ms / 1000)
+    base = f"http://127.0.0.1:{httpd.server_address[1]}"
+    jobs = [(f"{base}/{i}.jpg", f"patron_{i:04d}.jpg") for i in range(args.images)]
+
+    try:
+        run("serial", tempfile.mkdtemp(), jobs, concurrency=1, per_host_rate=args.rate)
+        run("cold", save, jobs, concurrency=args.concurrency, per_host_rate=args.rate)
+        run("rerun", save, jobs, concurrency=args.concurrency, per_host_rate=args.rate)
+        run("revalidate", save, jobs, concurrency=args.concurrency, per_host_rate=args.rate, revalidate=True)
+    finally:
+        httpd.shutdown()
+        shutil.rmtree(site)
+        shutil.rmtree(save)
+
+
+if __name__ == "__main__":
+    main()
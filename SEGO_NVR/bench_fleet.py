@@ -0,0 +1,90 @@
+"""
+Fleet refresh benchmark: serial UNVClient vs AsyncUNVClient fan-out across
+simulated NVRs (mock_lapi), including one hung NVR and one that is offline.
+
+    python bench_fleet.py --devices 100 --delay-ms 20
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+from mock_lapi import MockLAPI
+from unv_client import AsyncUNVClient, UNVClient, fetch_device_info_all, renew_all, subscribe_all
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def summarise(label, results, elapsed):
+    ok = sum(1 for r in results.values() if not isinstance(r, Exception))
+    print(f"{label:<28} {elapsed:>7.2f} s   ok {ok:>3} / {len(results)}")
+
+
+def run_serial(hosts, timeout):
+    results = {}
+    t0 = time.perf_counter()
+    for host in hosts:
+        client = UNVClient(host, "admin", "admin", verbose=False)
+        try:
+            results[host] = client.sendrq("System/DeviceInfo", "GET", "", timeout=timeout)
+        except Exception as e:
+            results[host] = e
+        client.close()
+    return results, time.perf_counter() - t0
+
+
+async def run_async(hosts, timeout):
+    AsyncUNVClient.set_pool_size(len(hosts) * 2)
+    clients = [AsyncUNVClient(h, "admin", "admin", timeout=timeout) for h in hosts]
+
+    t0 = time.perf_counter()
+    info = await fetch_device_info_all(clients)
+    summarise("async DeviceInfo (cold)", info, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    info = await fetch_device_info_all(clients)
+    summarise("async DeviceInfo (warm)", info, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    subs = await subscribe_all(clients, "127.0.0.1", 9000)
+    summarise("async subscribe all", subs, time.perf_counter() - t0)
+
+    sub_ids = {c: subs[c.nvr_ip]["Response"]["Data"]["ID"]
+               for c in clients if not isinstance(subs[c.nvr_ip], Exception)}
+    t0 = time.perf_counter()
+    renewed = await renew_all(sub_ids)
+    summarise("async renew all", renewed, time.perf_counter() - t0)
+
+    for c in clients:
+        c.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="AsyncUNVClient fleet benchmark")
+    ap.add_argument("--devices", type=int, default=100)
+    ap.add_argument("--delay-ms", type=float, default=20.0, help="per-request NVR latency")
+    ap.add_argument("--timeout", type=float, default=2.0)
+    ap.add_argument("--serial", action="store_true", help="also time the serial loop")
+    args = ap.parse_args()
+
+    servers = [MockLAPI(delay=args.delay_ms / 1000).start() for _ in range(args.devices - 2)]
+    hung = MockLAPI(delay=args.timeout * 3).start()
+    hosts = [f"127.0.0.1:{s.port}" for s in servers]
+    hosts += [f"127.0.0.1:{hung.port}", f"127.0.0.1:{free_port()}"]   # hung + offline
+
+    print(f"{args.devices} simulated NVRs, {args.delay_ms:.0f} ms latency, 1 hung, 1 offline")
+    if args.serial:
+        results, elapsed = run_serial(hosts, args.timeout)
+        summarise("serial DeviceInfo", results, elapsed)
+    asyncio.run(run_async(hosts, args.timeout))
+
+    for s in servers + [hung]:
+        s.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Load benchmark for unv_receiver.
+
+Starts a receiver in this process and fires synthetic Alarm/PersonInfo
+notifications (shaped like the captures in unv_events/) at it over many
+concurrent keep-alive connections.
+
+    python bench_receiver.py --mode asyncio --connections 500 --events 20000
+    python bench_receiver.py --mode thread  --connections 50  --events 2000
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+
+from unv_receiver import run_receiver
+
+ALARM_PATH = "/LAPI/V1.0/System/Event/Notification/Alarm"
+PERSON_PATH = "/LAPI/V1.0/System/Event/Notification/PersonInfo"
+REFERENCE = "192.168.1.105:80/210235XP4M3257000029/Subscription/Subscribers/9"
+
+
+def make_alarm(n, now):
+    related = f"C{now}{n:04d}"
+    return ALARM_PATH, {
+        "Reference": REFERENCE,
+        "AlarmInfo": {
+            "AlarmType": "FaceMatchAlarm",
+            "TimeStamp": now,
+            "AlarmSrcType": 8,
+            "AlarmSrcID": 2,
+            "RelatedID": related,
+        },
+    }
+
+
+def make_person(n, now, image_kb):
+    related = f"C{now}{n:04d}"
+    blob = base64.b64encode(os.urandom(image_kb * 1024)).decode("ascii")
+    return PERSON_PATH, {
+        "Reference": REFERENCE,
+        "DeviceID": "",
+        "PersonEventInfo": {
+            "ID": n,
+            "Timestamp": now,
+            "NotificationType": 0,
+            "FaceInfoNum": 1,
+            "FaceInfoList": [{
+                "RecordID": n,
+                "Type": 1,
+                "RelatedID": related,
+                "PassingTime": now,
+                "ChannelName": "Test",
+                "ChannelID": 2,
+                "CompareInfo": {
+                    "Similarity": 85,
+                    "PersonInfo": {
+                        "PersonID": 2005,
+                        "PersonName": "Bench Person",
+                        "ImageNum": 1,
+                        "ImageList": [{"FaceID": 0, "Type": 1, "Name": "Pic.jpg",
+                                       "Data": blob, "Size": image_kb * 1024}],
+                        "LibID": 1,
+                    },
+                    "SnapshotImage": {
+                        "BigImage": {"Size": image_kb * 1024, "Data": blob, "Type": 1},
+                    },
+                },
+            }],
+        },
+    }
+
+
+def build_requests(count, image_kb):
+    """Pre-render a small pool of raw HTTP requests that the clients cycle through."""
+    now = int(time.time())
+    pool = []
+    for n in range(count):
+        if n % 2 == 0:
+            path, payload = make_alarm(n, now)
+        else:
+            path, payload = make_person(n, now, image_kb)
+        body = json.dumps(payload).encode("utf-8")
+        head = (f"POST {path} HTTP/1.1\r\n"
+                f"Host: bench\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n").encode("ascii")
+        pool.append(head + body)
+    return pool
+
+
+async def read_response(reader):
+    """Returns True if the server will keep the connection open."""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+
+    keep_alive = lines[0].startswith("HTTP/1.1") and headers.get("connection", "").lower() != "close"
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    else:
+        await reader.read()
+        keep_alive = False
+    return keep_alive
+
+
+async def client(host, port, pool, counter, latencies, errors):
+    reader = writer = None
+    i = 0
+    while True:
+        if counter[0] <= 0:
+            break
+        counter[0] -= 1
+
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+
+            t0 = time.perf_counter()
+            writer.write(pool[i % len(pool)])
+            await writer.drain()
+            keep_alive = await read_response(reader)
+            latencies.append(time.perf_counter() - t0)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            errors[0] += 1
+            keep_alive = False
+        i += 1
+
+        if not keep_alive and writer is not None:
+            writer.close()
+            writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(host, port, connections, events, pool):
+    counter = [events]
+    latencies = []
+    errors = [0]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(host, port, pool, counter, latencies, errors) for _ in range(connections)))
+    elapsed = time.perf_counter() - t0
+    return elapsed, latencies, errors[0]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="unv_receiver load benchmark")
+    ap.add_argument("--mode", choices=["thread", "asyncio"], default="asyncio")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=9099)
+    ap.add_argument("--connections", type=int, default=200)
+    ap.add_argument("--events", type=int, default=10000)
+    ap.add_argument("--image-kb", type=int, default=64, help="size of each synthetic face image")
+    ap.add_argument("--spill-dir", default=None, help="stream-parse bodies and spill images here")
+    args = ap.parse_args()
+
+    received = [0]
+
+    def on_event(path, payload):
+        received[0] += 1
+
+    threading.Thread(target=run_receiver, args=(args.host, args.port, on_event, args.mode, args.spill_dir),
+                     daemon=True).start()
+    time.sleep(0.5)
+
+    pool = build_requests(32, args.image_kb)
+    elapsed, latencies, errors = asyncio.run(run_load(args.host, args.port, args.connections, args.events, pool))
+    time.sleep(0.2)
+
+    print(f"mode:          {args.mode}")
+    print(f"connections:   {args.connections}")
+    print(f"events sent:   {len(latencies)}")
+    print(f"events parsed: {received[0]}")
+    print(f"conn errors:   {errors}")
+    print(f"elapsed:       {elapsed:.2f} s")
+    print(f"events/sec:    {len(latencies) / elapsed:.0f}")
+    print(f"ack p50:       {percentile(latencies, 50) * 1000:.2f} ms")
+    print(f"ack p99:       {percentile(latencies, 99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Round trips per LAPI call: one-shot requests + fresh digest auth (the old
+UNVClient.sendrq) versus the pooled UNVClient session, against mock_lapi.
+
+    python bench_unv_client.py --calls 200 --delay-ms 2
+"""
+import argparse
+import time
+
+import requests
+from requests.auth import HTTPDigestAuth
+
+from mock_lapi import MockLAPI
+from unv_client import UNVClient
+
+
+def legacy_call(base, user, pw):
+    r = requests.request("GET", base + "System/DeviceInfo", json="",
+                         auth=HTTPDigestAuth(user, pw),
+                         headers={"Content-Type": "application/json"}, timeout=10)
+    return r.json()
+
+
+def run(label, server, calls, fn):
+    server.reset_counters()
+    t0 = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    elapsed = time.perf_counter() - t0
+    c = dict(server.counters)
+    print(f"{label:<8} {c['requests'] / calls:>9.2f} {c['connections'] / calls:>10.2f} "
+          f"{c['challenges']:>10} {elapsed / calls * 1000:>9.2f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="UNVClient session benchmark")
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--delay-ms", type=float, default=2.0, help="simulated NVR processing time per request")
+    ap.add_argument("--nonce-lifetime", type=float, default=300.0)
+    args = ap.parse_args()
+
+    server = MockLAPI(delay=args.delay_ms / 1000, nonce_lifetime=args.nonce_lifetime).start()
+    host = f"127.0.0.1:{server.port}"
+    base = f"http://{host}/LAPI/V1.0/"
+
+    print(f"{'':<8} {'HTTP/call':>9} {'TCP/call':>10} {'401s':>10} {'ms/call':>9}")
+    run("before", server, args.calls, lambda: legacy_call(base, "admin", "admin"))
+
+    client = UNVClient(host, "admin", "admin", verbose=False)
+    run("after", server, args.calls, client.get_device_info)
+    client.close()
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Content-addressed image store.
+
+Every blob lives once under root/<sha256[:2]>/<sha256><ext>, so the same
+enrolled face that comes back in every PersonInfo, or a patron photo copied by
+bulkimport on every run, costs one file. Lookups by hash are a single path
+check. Copies out of the store (link_to) use a copy-on-write reflink where the
+filesystem supports it, and a plain copy otherwise. Never a hardlink: the
+destinations are user-visible folders, and an in-place edit there would
+change the shared blob for every referrer. Without reflink support (ext4,
+NTFS) every copy out is a second full copy on disk, and stats() counts it.
+
+    store = BlobStore("blobs")
+    digest = store.put_file("patron_0001.jpg")
+    store.link_to(digest, "Image/patron_0001.jpg")
+    print(store.stats())
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+    FICLONE = 0x40049409
+except ImportError:  # Windows
+    fcntl = None
+
+READ_CHUNK = 1024 * 1024
+
+
+def sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def reflink(src, dst):
+    """Copy-on-write clone of src to dst. Returns False if the filesystem can't do it."""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.remove(dst)
+        return False
+
+
+class BlobStore:
+    def __init__(self, root, ext=".jpg"):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.ext = ext
+        self.lock = threading.Lock()
+        self.counters = {"puts": 0, "dedup_hits": 0, "logical_bytes": 0, "stored_bytes": 0,
+                         "reflinks": 0, "copies": 0, "copied_bytes": 0}
+
+    def path_for(self, digest):
+        return self.root / digest[:2] / f"{digest}{self.ext}"
+
+    def has(self, digest):
+        return self.path_for(digest).exists()
+
+    def temp_file(self):
+        """Returns (fileobj, path) for callers that hash while they write, then adopt()."""
+        fd, path = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+        return os.fdopen(fd, "wb"), path
+
+    def adopt(self, tmp_path, digest, size):
+        """Move a finished temp file into the store (or drop it if the blob is already there)."""
+        final = self.path_for(digest)
+        final.parent.mkdir(exist_ok=True)
+        with self.lock:
+            self.counters["puts"] += 1
+            self.counters["logical_bytes"] += size
+            if final.exists():
+                self.counters["dedup_hits"] += 1
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, final)
+                self.counters["stored_bytes"] += size
+        return final
+
+    def put_bytes(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has(digest):
+            with self.lock:
+                self.counters["puts"] += 1
+                self.counters["dedup_hits"] += 1
+                self.counters["logical_bytes"] += len(data)
+            return digest
+        f, tmp = self.temp_file()
+        with f:
+            f.write(data)
+        self.adopt(tmp, digest, len(data))
+        return digest
+
+    def put_file(self, src):
+        """Store a file by content. Returns its digest."""
+        digest = sha256_file(src)
+        size = os.path.getsize(src)
+        if self.has(digest):
+            with self.lock:
+                self.counters["puts"] += 1
+                self.counters["dedup_hits"] += 1
+                self.counters["logical_bytes"] += size
+            return digest
+
+        f, tmp = self.temp_file()
+        f.close()
+        if not reflink(src, tmp):
+            shutil.copyfile(src, tmp)
+        self.adopt(tmp, digest, size)
+        return digest
+
+    def link_to(self, digest, dst):
+        """Materialise an independent copy of a blob at dst, sharing its bytes only copy-on-write."""
+        src = self.path_for(digest)
+        dst = Path(dst)
+        if dst.exists():
+            # a hardlink left by an older version still shares the blob's inode: replace it
+            if not os.path.samefile(src, dst) and dst.stat().st_size == src.stat().st_size \
+                    and sha256_file(dst) == digest:
+                return dst
+            dst.unlink()
+        if reflink(src, dst):
+            with self.lock:
+                self.counters["reflinks"] += 1
+        else:
+            shutil.copyfile(src, dst)
+            with self.lock:
+                self.counters["copies"] += 1
+                self.counters["copied_bytes"] += src.stat().st_size
+        return dst
+
+    def disk_usage(self):
+        """(blobs, bytes) actually in the store right now, from every run."""
+        blobs = size = 0
+        for sub in self.root.iterdir():
+            if sub.is_dir() and sub != self.tmp_dir:
+                for f in sub.iterdir():
+                    blobs += 1
+                    size += f.stat().st_size
+        return blobs, size
+
+    def stats(self):
+        """
+        Counters for this process plus what is on disk. bytes_saved compares
+        what was put with what was written: new blobs plus full copies made
+        by link_to. It is negative when copies can't be reflinked. The
+        dedupe_ratio is None if nothing was written.
+        """
+        with self.lock:
+            c = dict(self.counters)
+        c["disk_blobs"], c["disk_bytes"] = self.disk_usage()
+        written = c["stored_bytes"] + c["copied_bytes"]
+        c["bytes_saved"] = c["logical_bytes"] - written
+        c["dedupe_ratio"] = c["logical_bytes"] / written if written else None
+        return c
@@ -1,11 +1,16 @@
+import argparse
 import base64
 import csv
 import re
-import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
-import requests
-from requests.auth import HTTPDigestAuth
+from blob_store import BlobStore
+from image_normalise import Normaliser
+from phash_index import Image, PhashIndex
+from unv_client import UNVClient
+from upload_ledger import UploadLedger
 
 # ========= EDIT THESE =========
 NVR_IP = "192.168.1.105"
@@ -16,9 +21,19 @@ LIB_ID = 1
 SOURCE_DIR = Path("SEGO_NVR/monty_RSL")        # where patron_XXXX.jpg files are
 OUTPUT_CSV = Path("Template.csv")
 OUTPUT_IMAGE_DIR = Path("Image")  # CSV references ./Image/<file>
+BLOB_DIR = Path("blobs")          # content-addressed store; Image/ holds copies (reflinks where supported)
+LEDGER_PATH = Path("enrol_ledger.jsonl")  # per-person upload results, used by --resume/--from-ledger
 
-BATCH_SIZE = 1                    # start with 1 until it works, then set 6
+BATCH_SIZE = 1                    # starting batch size; grows while the NVR keeps answering 0
+MAX_BATCH_SIZE = 16               # upper bound for the adaptive batch size
+MAX_IN_FLIGHT = 4                 # batches uploading at once per NVR
+BATCH_RETRIES = 3                 # attempts per batch before it is reported as failed
+CAP_RECOVER_AFTER = 8             # accepted batches in a row before a lowered size cap is raised by one
 ID_OFFSET = 10000                 # IMPORTANT: avoid clashing with existing IDs
+PAGE_SIZE = 200                   # people per page when listing the library for --sync
+NORMALISE_MAX_SIDE = 640          # --normalise: long side in px
+NORMALISE_TARGET_KB = 120         # --normalise: JPEG size target per image
+NEAR_DUP_RADIUS = 0               # dHash bits; a photo this close to an earlier one isn't enrolled (0 = off)
 # ==============================
 
 # Template CSV defaults
@@ -32,104 +47,467 @@ DEFAULT_ID_TYPE = "Other"
 PAT = re.compile(r"patron_(\d+)\.jpg$", re.IGNORECASE)
 
 
-def upload_batch(people_payload):
-    url = f"http://{NVR_IP}/LAPI/V1.0/PeopleLibraries/{LIB_ID}/People"
+class AdaptiveBatchSize:
+    """
+    Additive increase while uploads succeed, halve on errors. An app error
+    (599 / non-zero ResponseCode) on a batch of n also caps growth at n - 1,
+    so concurrent successes don't keep pushing back into the same limit; the
+    cap creeps back up by one after every CAP_RECOVER_AFTER accepted batches.
+    A refused batch of one says nothing about batch size (it's that person's
+    photo or data), so it changes neither the size nor the cap.
+    """
+
+    def __init__(self, start, lo=1, hi=MAX_BATCH_SIZE, recover_after=CAP_RECOVER_AFTER):
+        self.lo = lo
+        self.ceiling = hi
+        self.hi = hi
+        self.recover_after = recover_after
+        self.streak = 0
+        self.size = max(lo, min(hi, start))
+
+    def success(self):
+        self.streak += 1
+        if self.hi < self.ceiling and self.streak >= self.recover_after:
+            self.hi += 1
+            self.streak = 0
+        self.size = min(self.hi, self.size + 1)
+
+    def failure(self, batch_len=None):
+        if batch_len == 1:
+            return
+        self.streak = 0
+        if batch_len is not None:
+            self.hi = max(self.lo, min(self.hi, batch_len - 1))
+        self.size = max(self.lo, min(self.hi, self.size // 2))
+
+
+def upload_batch(client, people_payload):
     payload = {"Num": len(people_payload), "PersonInfoList": people_payload}
-    r = requests.post(url, json=payload, auth=HTTPDigestAuth(USER, PASS))
-    print("HTTP", r.status_code)
-    print(r.text)
     # don't raise_for_status because UNV uses 599 for app errors
-    return r.json()
+    return client.sendrq(f"PeopleLibraries/{LIB_ID}/People", "POST", payload, timeout=60)
 
 
-def main():
-    OUTPUT_IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+def update_people(client, people_payload):
+    """Replace one person's info and face image in place (batch of exactly one)."""
+    person = people_payload[0]
+    return client.sendrq(f"PeopleLibraries/{LIB_ID}/People/{person['PersonID']}", "PUT", person, timeout=60)
+
+
+def delete_people(client, people_payload):
+    person = people_payload[0]
+    return client.sendrq(f"PeopleLibraries/{LIB_ID}/People/{person['PersonID']}", "DELETE", "", timeout=60)
+
+
+def fetch_library(client, page_size=PAGE_SIZE):
+    """Yields every PersonInfo in LIB_ID, paging with Limit/Offset."""
+    offset = 0
+    while True:
+        payload = {"Num": 0, "QueryInfos": [], "Limit": page_size, "Offset": offset}
+        resp = client.sendrq(f"PeopleLibraries/{LIB_ID}/People/Info", "POST", payload, timeout=60)
+        if not batch_ok(resp):
+            raise RuntimeError(f"listing library {LIB_ID} failed: {describe_failure(resp)}")
+        data = resp["Response"]["Data"]
+        people = data.get("PersonInfoList") or []
+        yield from people
+        offset += len(people)
+        if not people or offset >= data.get("Total", 0):
+            return
+
+
+def batch_ok(resp):
+    return isinstance(resp, dict) and resp.get("Response", {}).get("ResponseCode") == 0
+
+
+def describe_failure(resp):
+    if isinstance(resp, dict):
+        r = resp.get("Response", {})
+        return f"ResponseCode={r.get('ResponseCode')} {r.get('ResponseString')}"
+    return repr(resp)
+
+
+def person_bytes(person):
+    return sum(len(img["Data"]) for img in person["ImageList"])
+
+
+class Uploader:
+    """
+    Keeps up to max_in_flight PersonInfoList batches in flight against one NVR.
+    A failed batch shrinks the batch size and is re-queued in smaller pieces,
+    up to `retries` attempts per person.
+
+    run() takes (meta, person) pairs; on_result(metas, ok, result) is called
+    once per accepted batch and once per batch that ran out of retries.
+    send(client, people) does the request; --sync swaps in update/delete calls.
+    """
+
+    def __init__(self, client, max_in_flight=MAX_IN_FLIGHT, retries=BATCH_RETRIES,
+                 start_batch=BATCH_SIZE, max_batch=MAX_BATCH_SIZE, on_result=None,
+                 send=upload_batch, label="Uploaded"):
+        self.client = client
+        self.on_result = on_result
+        self.send = send
+        self.label = label
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.sizer = AdaptiveBatchSize(start_batch, hi=max_batch)
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="upload")
+        self.in_flight = {}
+        self.retry_queue = []
+
+        self.sent_people = 0
+        self.sent_bytes = 0
+        self.failed = []          # ({PersonID, PersonName}, last error)
+        self.batches = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    def _submit(self, batch, attempt):
+        fut = self.pool.submit(self.send, self.client, [person for _, person in batch])
+        self.in_flight[fut] = (batch, attempt)
+
+    def _collect(self, block):
+        if not self.in_flight:
+            return
+        done, _ = wait(list(self.in_flight), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for fut in done:
+            batch, attempt = self.in_flight.pop(fut)
+            try:
+                resp = fut.result()
+            except Exception as e:
+                resp = e
+
+            self.batches += 1
+            if batch_ok(resp):
+                self.sizer.success()
+                self.sent_people += len(batch)
+                self.sent_bytes += sum(person_bytes(p) for _, p in batch)
+                if self.on_result:
+                    self.on_result([meta for meta, _ in batch], True, "ResponseCode=0")
+                continue
+
+            self.errors += 1
+            # a LAPI answer means the batch itself was refused; anything else may just be the network
+            refused = isinstance(resp, dict) and "Response" in resp
+            self.sizer.failure(len(batch) if refused else None)
+            print(f"Batch of {len(batch)} failed (attempt {attempt}): {describe_failure(resp)}")
+            if attempt >= self.retries:
+                self.failed.extend(({"PersonID": p["PersonID"], "PersonName": p["PersonName"]}, describe_failure(resp))
+                                   for _, p in batch)
+                if self.on_result:
+                    self.on_result([meta for meta, _ in batch], False, describe_failure(resp))
+                continue
+            # retry in pieces no larger than the (now smaller) batch size
+            step = self.sizer.size
+            for i in range(0, len(batch), step):
+                self.retry_queue.append((batch[i:i + step], attempt + 1))
+
+    def _wait_for_slot(self):
+        """Blocks until a new batch may be submitted; queued retries go out first."""
+        self._collect(block=False)
+        while True:
+            while len(self.in_flight) >= self.max_in_flight:
+                self._collect(block=True)
+            if not self.retry_queue:
+                return
+            self._submit(*self.retry_queue.pop(0))
+
+    def run(self, people):
+        """Upload every (meta, person) from the iterable. Returns True if all were accepted."""
+        pending = []
+        for item in people:
+            pending.append(item)
+            if len(pending) >= self.sizer.size:
+                self._wait_for_slot()
+                print(f"Uploading batch {self.batches + len(self.in_flight) + 1} ({len(pending)} people)")
+                self._submit(pending, 1)
+                pending = []
+        if pending:
+            self._wait_for_slot()
+            self._submit(pending, 1)
 
-    files = sorted([p for p in SOURCE_DIR.glob("*.jpg") if PAT.search(p.name)])
-    if not files:
-        raise SystemExit(f"No patron_####.jpg files found in {SOURCE_DIR.resolve()}")
+        while self.in_flight or self.retry_queue:
+            if self.retry_queue:
+                self._wait_for_slot()
+            else:
+                self._collect(block=True)
 
-    # ---- 1) Build CSV rows + API payload ----
-    csv_rows = []
-    people_payload = []
+        self.pool.shutdown()
+        return not self.failed
 
-    for idx, src in enumerate(files):
-        # copy image into ./Image/
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return (f"{self.label} {self.sent_people} people in {elapsed:.1f} s "
+                f"({self.sent_people / elapsed:.1f} people/s, {self.sent_bytes / 1e6 / elapsed:.2f} MB/s), "
+                f"{self.batches} batches, {self.errors} errors, {len(self.failed)} failed, "
+                f"final batch size {self.sizer.size}")
+
+
+CSV_FIELDS = [
+    "Name",
+    "Gender (Unidentified  Male  Female)",
+    "Date of Birth",
+    "Nationality",
+    "Province",
+    "City",
+    "ID Type (ID Card  Passport  Driver's License  Other)",
+    "ID No.",
+    "Image Path",
+]
+
+
+# ---- pipeline stages: scan -> copy -> csv -> encode -> (batch -> upload in Uploader) ----
+# Items flowing between stages are dicts: pid, name, src, dst, sha256 (of the source photo),
+# plus "upload" when --normalise put a smaller copy in the blob store.
+
+def scan(source_dir):
+    return sorted(p for p in source_dir.glob("*.jpg") if PAT.search(p.name))
+
+
+def assign_ids(files, known=None):
+    """UNIQUE IDs: 10000, 10001, ... by file order; names already in the ledger keep their ID."""
+    if not known:
+        return {src.stem: ID_OFFSET + idx for idx, src in enumerate(files)}
+    ids = dict(known)
+    next_id = max(max(known.values()) + 1, ID_OFFSET)
+    for src in files:
+        if src.stem not in ids:
+            ids[src.stem] = next_id
+            next_id += 1
+    return ids
+
+
+def copy_stage(files, store, ids):
+    """Store each image once by content, then copy it (reflink where possible) into ./Image/."""
+    for src in files:
         dst = OUTPUT_IMAGE_DIR / src.name
-        if not dst.exists():
-            shutil.copy2(src, dst)
+        digest = store.put_file(src)
+        store.link_to(digest, dst)
+        yield {"pid": ids[src.stem], "name": src.stem, "src": src, "dst": dst, "sha256": digest}
+
+
+def dedupe_stage(items, index, linked):
+    """Drops people whose photo near-duplicates an earlier person's; linked collects (item, earlier name)."""
+    for item in items:
+        try:
+            dup = index.check_file(item["name"], item["dst"], item["sha256"])
+        except Exception as e:
+            print(f"Could not hash {item['name']}: {e}")
+            dup = None
+        if dup is not None:
+            linked.append((item, dup))
+            continue
+        yield item
 
-        # UNIQUE IDs: 10000, 10001, 10002, ...
-        pid = ID_OFFSET + idx
-        name = src.stem                  # patron_0023 etc
-        id_no = str(pid)
-        image_path = f"./Image/{dst.name}"
 
-        csv_rows.append({
-            "Name": name,
+def csv_stage(items, writer, f):
+    """Write each Template CSV row as soon as its image is in place."""
+    for item in items:
+        writer.writerow({
+            "Name": item["name"],
             "Gender (Unidentified  Male  Female)": DEFAULT_GENDER,
             "Date of Birth": DEFAULT_DOB,
             "Nationality": DEFAULT_NATIONALITY,
             "Province": DEFAULT_PROVINCE,
             "City": DEFAULT_CITY,
             "ID Type (ID Card  Passport  Driver's License  Other)": DEFAULT_ID_TYPE,
-            "ID No.": id_no,
-            "Image Path": image_path,
+            "ID No.": str(item["pid"]),
+            "Image Path": f"./Image/{item['dst'].name}",
         })
+        f.flush()
+        yield item
 
-        raw = dst.read_bytes()
-        b64 = base64.b64encode(raw).decode("ascii")
-        size_bytes = len(raw)  # <-- IMPORTANT: raw bytes size, not len(b64)
 
-        people_payload.append({
+def skip_acknowledged(items, ledger, counter):
+    for item in items:
+        if ledger.acknowledged(item["pid"], item["sha256"]):
+            counter[0] += 1
+            continue
+        yield item
+
+
+def encode_stage(items):
+    for item in items:
+        raw = item.get("upload", item["dst"]).read_bytes()
+        pid = item["pid"]
+        yield item, {
             "PersonID": pid,
-            "PersonCode": id_no,
-            "PersonName": name,
+            "PersonCode": str(pid),
+            "PersonName": item["name"],     # patron_0023 etc
             "ImageNum": 1,
             "ImageList": [{
                 "FaceID": pid,
-                "Name": dst.name,
-                "Size": size_bytes,
-                "Data": b64,
-                "Type": 1,      # <-- IMPORTANT on some firmwares
+                "Name": item["src"].name,     # patron_0023.jpg; dst is a blob path under --from-ledger
+                "Size": len(raw),           # <-- IMPORTANT: raw bytes size, not len(b64)
+                "Data": base64.b64encode(raw).decode("ascii"),
+                "Type": 1,                  # <-- IMPORTANT on some firmwares
             }]
-        })
+        }
 
-    # ---- 2) Write CSV (your required structure) ----
-    fieldnames = [
-        "Name",
-        "Gender (Unidentified  Male  Female)",
-        "Date of Birth",
-        "Nationality",
-        "Province",
-        "City",
-        "ID Type (ID Card  Passport  Driver's License  Other)",
-        "ID No.",
-        "Image Path",
+
+def ledger_failures(ledger, store):
+    """Items for every person whose last recorded upload failed, read back from the blob store."""
+    for rec in sorted(ledger.failures(), key=lambda r: r["PersonID"]):
+        if not store.has(rec["SHA256"]):
+            print(f"SKIP {rec['PersonID']} {rec['Name']}: image {rec['SHA256'][:12]} not in {BLOB_DIR}")
+            continue
+        src = Path(rec["Source"])
+        yield {"pid": rec["PersonID"], "name": rec["Name"], "src": src,
+               "dst": store.path_for(rec["SHA256"]), "sha256": rec["SHA256"]}
+
+
+def plan_sync(items, remote_ids, ledger, keep=()):
+    """
+    Splits the local folder against the NVR library: adds are missing remotely,
+    updates are present but not acknowledged with this image hash, deletes are
+    people this ledger enrolled that are gone from the folder. People enrolled
+    by other means (not in the ledger) are never deleted, and neither are the
+    PersonIDs in keep (still in the folder, but held back from this run).
+    """
+    adds, updates, local = [], [], set(keep)
+    for item in items:
+        local.add(item["pid"])
+        if item["pid"] not in remote_ids:
+            adds.append(item)
+        elif not ledger.acknowledged(item["pid"], item["sha256"]):
+            updates.append(item)
+    deletes = []
+    for pid in sorted((ledger.managed() & remote_ids) - local):
+        rec = ledger.entries[pid]
+        deletes.append({"pid": pid, "name": rec["Name"], "src": rec["Source"], "sha256": rec["SHA256"]})
+    return adds, updates, deletes
+
+
+def run_sync(client, ledger, items, prepare=iter, keep=()):
+    """Sends only the adds, changed images and deletes. Returns (ok, uploaders)."""
+    remote_ids = {p["PersonID"] for p in fetch_library(client)}
+    adds, updates, deletes = plan_sync(items, remote_ids, ledger, keep)
+    print(f"Library {LIB_ID}: {len(remote_ids)} people on the NVR, {len(items)} in {SOURCE_DIR}; "
+          f"{len(adds)} to add, {len(updates)} to update, {len(deletes)} to delete, "
+          f"{len(items) - len(adds) - len(updates)} unchanged")
+
+    def record_deleted(metas, ok, result):
+        if ok:
+            ledger.record(metas, ok, result, status="deleted")
+
+    uploaders = [
+        (Uploader(client, on_result=ledger.record), encode_stage(prepare(adds))),
+        (Uploader(client, on_result=ledger.record, send=update_people, start_batch=1, max_batch=1,
+                  label="Updated"), encode_stage(prepare(updates))),
+        (Uploader(client, on_result=record_deleted, send=delete_people, start_batch=1, max_batch=1,
+                  label="Deleted"),
+         ((d, {"PersonID": d["pid"], "PersonName": d["name"], "ImageList": []}) for d in deletes)),
     ]
+    ok = True
+    for uploader, people in uploaders:
+        ok = uploader.run(people) and ok
+    return ok, [u for u, _ in uploaders]
 
-    with OUTPUT_CSV.open("w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
-        w.writeheader()
-        w.writerows(csv_rows)
 
-    print(f"Wrote CSV: {OUTPUT_CSV.resolve()} ({len(csv_rows)} rows)")
-    print(f"Images copied to: {OUTPUT_IMAGE_DIR.resolve()}")
+def parse_args():
+    ap = argparse.ArgumentParser(description="Bulk-enrol patron photos into a UNV people library")
+    mode = ap.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true",
+                      help="rescan SOURCE_DIR but skip people the ledger shows as accepted with the same image")
+    mode.add_argument("--from-ledger", action="store_true",
+                      help="don't scan; retry only the people whose last upload failed")
+    mode.add_argument("--sync", action="store_true",
+                      help="compare SOURCE_DIR with the NVR library; send only adds, changed images and deletes")
+    ap.add_argument("--ledger", type=Path, default=LEDGER_PATH)
+    ap.add_argument("--near-dup-radius", type=int, default=NEAR_DUP_RADIUS, metavar="BITS",
+                    help="don't enrol a photo within BITS dHash bits of an earlier one (default off; "
+                         "different people against the same background can match)")
+    ap.add_argument("--normalise", action="store_true",
+                    help="downscale, strip EXIF and recompress each photo before upload (needs Pillow)")
+    return ap.parse_args()
 
-    # ---- 3) Upload ----
-    for i in range(0, len(people_payload), BATCH_SIZE):
-        batch = people_payload[i:i + BATCH_SIZE]
-        print(f"\nUploading batch {i//BATCH_SIZE + 1} ({len(batch)} people)")
-        resp = upload_batch(batch)
 
-        # Quick stop if API still unhappy (keeps it simple)
-        r = resp.get("Response", {})
-        if r.get("ResponseCode") != 0:
-            print("STOPPING due to error:", r)
-            break
+def main():
+    args = parse_args()
+    OUTPUT_IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+    store = BlobStore(BLOB_DIR)
+    ledger = UploadLedger(args.ledger)
+
+    client = UNVClient(NVR_IP, USER, PASS, pool_size=MAX_IN_FLIGHT, verbose=False)
+    uploaders = [Uploader(client, on_result=ledger.record)]
+    skipped = [0]
+    linked = []
+    index = None
+    if args.near_dup_radius and not args.from_ledger:
+        if Image is None:
+            print("Pillow not installed; near-duplicate photos will not be detected (pip install Pillow)")
+        else:
+            index = PhashIndex(BLOB_DIR / "phash.jsonl", radius=args.near_dup_radius)
+    normaliser = None
+    prepare = iter
+    if args.normalise:
+        normaliser = Normaliser(store, max_side=NORMALISE_MAX_SIDE, target_bytes=NORMALISE_TARGET_KB * 1024)
+        prepare = normaliser.stage
+
+    if args.from_ledger:
+        items = list(ledger_failures(ledger, store))
+        print(f"Retrying {len(items)} failed people from {args.ledger}")
+        ok = uploaders[0].run(encode_stage(prepare(items)))
+        rows = None
+    else:
+        files = scan(SOURCE_DIR)
+        if not files:
+            raise SystemExit(f"No patron_####.jpg files found in {SOURCE_DIR.resolve()}")
+        ids = assign_ids(files, ledger.ids_by_name() if args.resume or args.sync else None)
+
+        # Nothing is built up front: each person is copied, written to the CSV and
+        # base64-encoded only when the uploader pulls it into a batch, so memory is
+        # bounded by MAX_IN_FLIGHT * MAX_BATCH_SIZE images, not the library size.
+        with OUTPUT_CSV.open("w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+            w.writeheader()
+            items = copy_stage(files, store, ids)
+            if index is not None:
+                items = dedupe_stage(items, index, linked)
+            items = csv_stage(items, w, f)
+            if args.sync:
+                # the diff needs every hash first; items are small dicts, images stay on disk
+                items = list(items)
+                # people held back as near-duplicates are still in the folder: don't delete them
+                ok, uploaders = run_sync(client, ledger, items, prepare, keep={item["pid"] for item, _ in linked})
+            else:
+                if args.resume:
+                    items = skip_acknowledged(items, ledger, skipped)
+                ok = uploaders[0].run(encode_stage(prepare(items)))
+        rows = len(files) - len(linked)
+    client.close()
+    ledger.close()
+    if index is not None:
+        index.close()
+
+    if rows is not None:
+        print(f"\nWrote CSV: {OUTPUT_CSV.resolve()} ({rows} rows)")
+        print(f"Images copied into: {OUTPUT_IMAGE_DIR.resolve()}")
+    st = store.stats()
+    image_bytes = sum(f.stat().st_size for f in OUTPUT_IMAGE_DIR.iterdir() if f.is_file())
+    print(f"Blob store: {st['puts']} images, {st['dedup_hits']} duplicates, "
+          f"{st['disk_bytes'] / 1e6:.1f} MB on disk in {st['disk_blobs']} blobs")
+    print(f"{OUTPUT_IMAGE_DIR}/: {image_bytes / 1e6:.1f} MB; this run {st['reflinks']} reflinked (shared with "
+          f"the store), {st['copies']} full copies ({st['copied_bytes'] / 1e6:.1f} MB)")
+    if st["dedupe_ratio"] is not None:
+        print(f"Written this run: {(st['logical_bytes'] - st['bytes_saved']) / 1e6:.1f} MB for "
+              f"{st['logical_bytes'] / 1e6:.1f} MB of images (ratio {st['dedupe_ratio']:.2f})")
 
-    print("\nDone.")
+    if normaliser is not None:
+        print(normaliser.summary())
+    for item, dup in linked:
+        print(f"LINKED {item['name']} -> {dup} (near-duplicate photo, not enrolled)")
+    if skipped[0]:
+        print(f"Skipped {skipped[0]} people already accepted (ledger {args.ledger})")
+    for n, uploader in enumerate(uploaders):
+        if n and not uploader.batches:
+            continue
+        print(uploader.summary())
+        for person, resp in uploader.failed:
+            print(f"FAILED {person['PersonID']} {person['PersonName']}: {resp}")
+    if not ok:
+        print("Retry with: python bulkimport.py " + ("--sync" if args.sync else "--from-ledger"))
+    print("\nDone." if ok else "\nDone with failures.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,164 @@
+"""
+Joins the two halves of a UNV face match.
+
+The NVR sends a small Alarm (AlarmType FaceMatchAlarm) and a large PersonInfo
+for the same RelatedID, in either order and usually milliseconds apart.
+Correlator.feed() holds whichever half arrives first in a dict keyed by
+(device, RelatedID) -- RelatedIDs are per-NVR counters, so halves from
+different NVRs never pair -- and schedules it on a timing wheel. When the
+other half arrives on_match(record) gets one merged record per face (a
+PersonInfo may carry several faces for one RelatedID); if it doesn't arrive
+within window_s, on_unmatched(kind, related_id, part) gets each lone half.
+
+Pending halves are capped at max_pending (oldest reported as unmatched), so
+memory stays flat under bursts. Call start() for a background expiry tick, or
+call tick() yourself.
+"""
+import math
+import threading
+import time
+
+
+class Correlator:
+    def __init__(self, on_match, on_unmatched=None, window_s=5.0, resolution_s=0.25, max_pending=10000):
+        self.on_match = on_match
+        self.on_unmatched = on_unmatched
+        self.window_s = window_s
+        self.resolution_s = resolution_s
+        self.max_pending = max_pending
+
+        # (device, RelatedID) -> (kind, [part, ...], slot)
+        self.pending = {}
+        self.wheel = [set() for _ in range(math.ceil(window_s / resolution_s) + 1)]
+        self.tick_no = self._now_tick()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+
+        self.stats = {"matched": 0, "unmatched_alarm": 0, "unmatched_person": 0, "evicted": 0}
+
+    def _now_tick(self):
+        return int(time.monotonic() / self.resolution_s)
+
+    def feed(self, path, payload):
+        """on_event-compatible entry point."""
+        device = device_key(payload)
+        parts = {}
+        if "AlarmInfo" in payload:
+            ai = payload["AlarmInfo"]
+            parts[("alarm", ai.get("RelatedID"))] = [payload]
+        elif "PersonEventInfo" in payload:
+            for face in payload["PersonEventInfo"].get("FaceInfoList") or []:
+                parts.setdefault(("person", face.get("RelatedID")), []).append(face)
+
+        for (kind, related_id), group in parts.items():
+            if not related_id:
+                for part in group:
+                    self._report(kind, None, part)
+                continue
+            self._add(kind, (device, related_id), group)
+        self.tick()
+
+    def _add(self, kind, key, parts):
+        matched, evicted = [], None
+        related_id = key[1]
+        with self.lock:
+            held = self.pending.get(key)
+            if held is not None and held[0] != kind:
+                del self.pending[key]
+                self.wheel[held[2] % len(self.wheel)].discard(key)
+                alarm, faces = (held[1][-1], parts) if kind == "person" else (parts[-1], held[1])
+                matched = [merge(related_id, alarm, face) for face in faces]
+                self.stats["matched"] += len(matched)
+            else:
+                if held is not None:
+                    # same half again: more faces add up, a repeated alarm replaces the old one
+                    self.wheel[held[2] % len(self.wheel)].discard(key)
+                    del self.pending[key]
+                    if kind == "person":
+                        parts = held[1] + parts
+                elif len(self.pending) >= self.max_pending:
+                    old_key = next(iter(self.pending))
+                    old_kind, old_parts, old_slot = self.pending.pop(old_key)
+                    self.wheel[old_slot % len(self.wheel)].discard(old_key)
+                    self.stats["evicted"] += 1
+                    evicted = (old_kind, old_key[1], old_parts)
+
+                slot = self._now_tick() + len(self.wheel) - 1
+                self.pending[key] = (kind, parts, slot)
+                self.wheel[slot % len(self.wheel)].add(key)
+
+        if evicted:
+            for part in evicted[2]:
+                self._report(evicted[0], evicted[1], part)
+        for record in matched:
+            self.on_match(record)
+
+    def tick(self):
+        """Expire every half whose join window has passed."""
+        expired = []
+        with self.lock:
+            now = self._now_tick()
+            while self.tick_no < now:
+                self.tick_no += 1
+                bucket = self.wheel[self.tick_no % len(self.wheel)]
+                for key in list(bucket):
+                    kind, parts, slot = self.pending[key]
+                    if slot <= self.tick_no:
+                        bucket.discard(key)
+                        del self.pending[key]
+                        expired.extend((kind, key[1], part) for part in parts)
+                # a long stall: every slot has been visited once, the rest are empty too
+                if now - self.tick_no > len(self.wheel):
+                    self.tick_no = now - len(self.wheel)
+        for item in expired:
+            self._report(*item)
+
+    def _report(self, kind, related_id, part):
+        with self.lock:
+            self.stats["unmatched_alarm" if kind == "alarm" else "unmatched_person"] += 1
+        if self.on_unmatched:
+            self.on_unmatched(kind, related_id, part)
+
+    def start(self):
+        def loop():
+            while not self.stop_event.wait(self.resolution_s):
+                self.tick()
+        threading.Thread(target=loop, name="correlator-tick", daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def device_key(payload):
+    """
+    Which NVR sent a notification: host and serial from Reference
+    ("192.168.1.105:80/210235XP4M.../Subscription/Subscribers/9"), which both
+    halves carry, else DeviceID. The subscriber number is left out because it
+    changes on resubscribe.
+    """
+    if payload.get("Reference"):
+        return payload["Reference"].split("/Subscription", 1)[0]
+    return payload.get("DeviceID") or ""
+
+
+def merge(related_id, alarm, face):
+    """One flat record for a face match, from an Alarm payload and a FaceInfoList entry."""
+    ai = alarm.get("AlarmInfo", {})
+    compare = face.get("CompareInfo", {})
+    person = compare.get("PersonInfo", {})
+    return {
+        "RelatedID": related_id,
+        "AlarmType": ai.get("AlarmType"),
+        "AlarmSrcID": ai.get("AlarmSrcID"),
+        "TimeStamp": ai.get("TimeStamp"),
+        "Reference": alarm.get("Reference"),
+        "RecordID": face.get("RecordID"),
+        "PassingTime": face.get("PassingTime"),
+        "ChannelID": face.get("ChannelID"),
+        "ChannelName": face.get("ChannelName"),
+        "Similarity": compare.get("Similarity"),
+        "PersonID": person.get("PersonID"),
+        "PersonName": person.get("PersonName"),
+        "LibID": person.get("LibID"),
+        "face": face,
+    }
@@ -0,0 +1,577 @@
+"""
+Append-only event journal for UNV notifications.
+
+Events are appended as JSON lines to rolling segment files
+(journal/seg-00000001.log ...). Every segment has a fixed-width sidecar index
+(.idx) with one entry per event: receive time, byte offset/length, event type,
+channel, RecordID and RelatedID. Within a segment the .idx is sorted by time,
+so a time range is two binary searches per segment and filters on type or
+channel never touch the .log. When a segment is sealed a .kdx file (sorted
+64-bit hashes of RelatedID/RecordID) is written next to it for key lookups.
+Results spanning several segments are merged in time order.
+
+The .idx keeps the first 24 bytes of the first face's RelatedID and the
+number of faces; the other faces of a PersonInfo are in the key index too
+(read back from the .log when it is rebuilt). A match on a longer or
+non-first RelatedID is checked against the record before it counts.
+
+Buffered records are flushed and fsynced every FSYNC_EVERY appends, and by a
+background timer every FSYNC_INTERVAL, so a burst doesn't sit in memory
+until the next event. Reopening after a crash trims a partial .idx entry and
+anything in the .log past the last indexed record.
+
+    journal = EventJournal("journal")
+    journal.append(path, payload)                  # usable as on_event
+    journal.query(t1_ms, t2_ms, types=FACE_MATCH_TYPES, channel=2)
+    journal.by_related("C17717573362137")
+
+    python event_journal.py import ../unv_events journal    # images go to journal/blobs
+    python event_journal.py query journal --channel 2 --face-match
+"""
+import argparse
+import base64
+import binascii
+import bisect
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+from blob_store import BlobStore
+
+SEGMENT_BYTES = 64 * 1024 * 1024
+FSYNC_EVERY = 64          # records
+FSYNC_INTERVAL = 1.0      # seconds
+
+# ts_ms, offset, length, channel, type, faces, record_id, related_id (faces was padding, 0 in old files)
+IDX = struct.Struct("<qQIhBBq24s")
+RELATED_BYTES = 24
+# key hash, entry number
+KDX = struct.Struct("<QI")
+
+TYPE_CODES = {"Alarm": 1, "FaceMatchAlarm": 2, "PersonInfo": 3}
+TYPE_NAMES = {v: k for k, v in TYPE_CODES.items()}
+FACE_MATCH_TYPES = ("FaceMatchAlarm", "PersonInfo")
+
+Entry = namedtuple("Entry", "segment ts_ms offset length channel type faces record_id related_id")
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def stored_related(related_id):
+    """RelatedID as the .idx keeps it (and as keys are hashed): ASCII, first RELATED_BYTES bytes."""
+    return str(related_id).encode("ascii", "replace")[:RELATED_BYTES].decode("ascii")
+
+
+def describe(path, payload):
+    """Pulls (type, channel, record_id, related_id) out of a notification."""
+    if "AlarmInfo" in payload or path.endswith("/Alarm"):
+        ai = payload.get("AlarmInfo", {})
+        kind = "FaceMatchAlarm" if ai.get("AlarmType") == "FaceMatchAlarm" else "Alarm"
+        return kind, int(ai.get("AlarmSrcID", -1)), -1, ai.get("RelatedID") or ""
+
+    if "PersonEventInfo" in payload or path.endswith("/PersonInfo"):
+        faces = payload.get("PersonEventInfo", {}).get("FaceInfoList") or [{}]
+        f0 = faces[0]
+        return "PersonInfo", int(f0.get("ChannelID", -1)), int(f0.get("RecordID", -1)), f0.get("RelatedID") or ""
+
+    return None, -1, -1, ""
+
+
+def related_ids(path, payload):
+    """Every RelatedID in a notification: the alarm's, or one per face of a PersonInfo."""
+    if "AlarmInfo" in payload or path.endswith("/Alarm"):
+        ids = [payload.get("AlarmInfo", {}).get("RelatedID")]
+    else:
+        ids = [f.get("RelatedID") for f in payload.get("PersonEventInfo", {}).get("FaceInfoList") or []]
+    return [str(i) for i in ids if i]
+
+
+class Segment:
+    def __init__(self, base):
+        self.base = base
+        self.number = int(base.name.split("-")[1])
+        self.log_path = base.with_suffix(".log")
+        self.idx_path = base.with_suffix(".idx")
+        self.kdx_path = base.with_suffix(".kdx")
+
+    def count(self):
+        return self.idx_path.stat().st_size // IDX.size if self.idx_path.exists() else 0
+
+    def entry(self, buf, i):
+        ts, offset, length, channel, kind, faces, record_id, related = IDX.unpack_from(buf, i * IDX.size)
+        return Entry(self, ts, offset, length, channel, kind, faces, record_id,
+                     related.rstrip(b"\0").decode("ascii"))
+
+    def bounds(self, buf, n):
+        return IDX.unpack_from(buf, 0)[0], IDX.unpack_from(buf, (n - 1) * IDX.size)[0]
+
+    def lower(self, buf, n, ts):
+        lo, hi = 0, n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if IDX.unpack_from(buf, mid * IDX.size)[0] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def read(self, entry, log=None):
+        if log is None:
+            with open(self.log_path, "rb") as f:
+                return self.read(entry, f)
+        log.seek(entry.offset)
+        return json.loads(log.read(entry.length))
+
+    def key_hashes(self, e, log):
+        """Hashes entry e is found under: each face's RelatedID (from the .log if several) and "R<RecordID>"."""
+        keys = {key_hash(e.related_id)} if e.related_id else set()
+        if e.faces > 1:
+            record = self.read(e, log)
+            keys.update(key_hash(stored_related(r)) for r in related_ids(record["path"], record["payload"]))
+        if e.record_id >= 0:
+            keys.add(key_hash(f"R{e.record_id}"))
+        return keys
+
+    def recover(self):
+        """Trims a torn tail after a crash: a partial .idx entry, and .log bytes past the last indexed record."""
+        idx_size = self.idx_path.stat().st_size
+        log_size = self.log_path.stat().st_size
+        n = idx_size // IDX.size
+        with open(self.idx_path, "rb") as f:
+            buf = f.read(n * IDX.size)
+        end = 0
+        with open(self.log_path, "rb") as log:
+            # an index entry can reach disk before its record; drop entries whose line isn't all there
+            while n:
+                e = self.entry(buf, n - 1)
+                end = e.offset + e.length
+                if end <= log_size:
+                    log.seek(end - 1)
+                    if log.read(1) == b"\n":
+                        break
+                n -= 1
+                end = 0
+        if n * IDX.size == idx_size and end == log_size:
+            return
+        print(f"journal: trimming {self.base.name} to {n} records "
+              f"({idx_size - n * IDX.size} index bytes, {log_size - end} log bytes)")
+        with open(self.idx_path, "r+b") as f:
+            f.truncate(n * IDX.size)
+        with open(self.log_path, "r+b") as f:
+            f.truncate(end)
+
+    def write_kdx(self):
+        keys = []
+        with open(self.idx_path, "rb") as f:
+            buf = f.read()
+        with open(self.log_path, "rb") as log:
+            for i in range(len(buf) // IDX.size):
+                keys.extend((h, i) for h in self.key_hashes(self.entry(buf, i), log))
+        keys.sort()
+        with open(self.kdx_path, "wb") as f:
+            for k in keys:
+                f.write(KDX.pack(*k))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class EventJournal:
+    def __init__(self, root, segment_bytes=SEGMENT_BYTES, fsync_every=FSYNC_EVERY, fsync_interval=FSYNC_INTERVAL):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+
+        self.segments = sorted((Segment(p.with_suffix("")) for p in self.root.glob("seg-*.log")),
+                               key=lambda s: s.number)
+        for seg in self.segments[:-1]:
+            if not seg.kdx_path.exists():
+                seg.write_kdx()
+
+        # key hash -> [entry numbers] for the active (unsealed) segment
+        self.active_keys = {}
+        self.log = self.idx = None
+        self.last_ts = None
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.closed = False
+
+        if self.segments:
+            self._open_active(self.segments[-1])
+        else:
+            self._roll()
+
+        self.stop_event = threading.Event()
+        threading.Thread(target=self._sync_loop, name="journal-sync", daemon=True).start()
+
+    def _sync_loop(self):
+        while not self.stop_event.wait(self.fsync_interval):
+            with self.lock:
+                if not self.closed and time.monotonic() - self.last_sync >= self.fsync_interval:
+                    self._sync()
+
+    # ---- writing ----
+
+    def _open_active(self, seg):
+        seg.recover()
+        self.active = seg
+        self.active_keys = {}
+        self.last_ts = None
+        with open(seg.idx_path, "rb") as f:
+            buf = f.read()
+        with open(seg.log_path, "rb") as log:
+            for i in range(len(buf) // IDX.size):
+                e = seg.entry(buf, i)
+                self._index_keys(seg.key_hashes(e, log), i)
+                self.last_ts = e.ts_ms
+        self.log = open(seg.log_path, "ab")
+        self.idx = open(seg.idx_path, "ab")
+
+    def _index_keys(self, hashes, i):
+        for h in hashes:
+            self.active_keys.setdefault(h, []).append(i)
+
+    def _roll(self):
+        if self.log is not None:
+            self._sync()
+            self.log.close()
+            self.idx.close()
+            self.active.write_kdx()
+        number = self.segments[-1].number + 1 if self.segments else 1
+        seg = Segment(self.root / f"seg-{number:08d}")
+        seg.log_path.touch()
+        seg.idx_path.touch()
+        self.segments.append(seg)
+        self._open_active(seg)
+
+    def _sync(self):
+        if self.unsynced:
+            self.log.flush()
+            self.idx.flush()
+            os.fsync(self.log.fileno())
+            os.fsync(self.idx.fileno())
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def append(self, path, payload, ts_ms=None):
+        """Journal one notification. Signature matches on_event."""
+        kind, channel, record_id, related = describe(path, payload)
+        related_all = related_ids(path, payload)
+        body = json.dumps(payload, separators=(",", ":"))
+
+        with self.lock:
+            if self.closed:
+                return
+            if ts_ms is None:
+                # live appends: never let a clock step break the segment's time order
+                ts_ms = int(time.time() * 1000)
+                if self.last_ts is not None and ts_ms < self.last_ts:
+                    ts_ms = self.last_ts
+            line = f'{{"t":{ts_ms},"path":{json.dumps(path)},"payload":{body}}}\n'.encode("utf-8")
+
+            # keep each segment's index time-sorted; out-of-order imports start a new segment
+            if self.log.tell() + len(line) > self.segment_bytes and self.log.tell() > 0:
+                self._roll()
+            elif self.last_ts is not None and ts_ms < self.last_ts:
+                self._roll()
+
+            offset = self.log.tell()
+            n = self.idx.tell() // IDX.size
+            stored = stored_related(related)
+            faces = min(len(related_all), 255)
+            self.log.write(line)
+            self.idx.write(IDX.pack(ts_ms, offset, len(line), channel, TYPE_CODES.get(kind, 0), faces, record_id,
+                                    stored.encode("ascii")))
+            # keys are hashed as stored, so active and sealed (.kdx) lookups agree
+            hashes = {key_hash(stored_related(r)) for r in related_all}
+            if record_id >= 0:
+                hashes.add(key_hash(f"R{record_id}"))
+            self._index_keys(hashes, n)
+            self.last_ts = ts_ms
+            self.unsynced += 1
+
+            if self.unsynced >= self.fsync_every or time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+
+    def sync(self):
+        with self.lock:
+            if not self.closed:
+                self._sync()
+
+    def close(self):
+        """Flushes and closes; appends arriving afterwards (e.g. during shutdown) are dropped."""
+        self.stop_event.set()
+        with self.lock:
+            if self.closed:
+                return
+            self._sync()
+            self.log.close()
+            self.idx.close()
+            self.closed = True
+
+    # ---- reading ----
+
+    def _mapped(self, seg):
+        if seg is self.active:
+            self.idx.flush()
+            self.log.flush()
+        n = seg.count()
+        if n == 0:
+            return None, 0
+        with open(seg.idx_path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), n
+
+    def entries(self, start_ms=None, end_ms=None, types=None, channel=None):
+        """Index-only scan: yields Entry for events with start_ms <= ts < end_ms, in time order."""
+        codes = {TYPE_CODES[t] for t in types} if types else None
+        with self.lock:
+            segments = list(self.segments)
+        # each segment is time-sorted, but out-of-order imports make segments overlap
+        return heapq.merge(*(self._scan(seg, start_ms, end_ms, codes, channel) for seg in segments),
+                           key=lambda e: e.ts_ms)
+
+    def _scan(self, seg, start_ms, end_ms, codes, channel):
+        with self.lock:
+            buf, n = self._mapped(seg)
+        if not n:
+            return
+        try:
+            first, last = seg.bounds(buf, n)
+            if (end_ms is not None and first >= end_ms) or (start_ms is not None and last < start_ms):
+                return
+            i = seg.lower(buf, n, start_ms) if start_ms is not None else 0
+            stop = seg.lower(buf, n, end_ms) if end_ms is not None else n
+            for j in range(i, stop):
+                e = seg.entry(buf, j)
+                if codes is not None and e.type not in codes:
+                    continue
+                if channel is not None and e.channel != channel:
+                    continue
+                yield e
+        finally:
+            buf.close()
+
+    def query(self, start_ms=None, end_ms=None, types=None, channel=None):
+        """Yields journal records ({"t", "path", "payload"}) matching the filters."""
+        for e in self.entries(start_ms, end_ms, types, channel):
+            yield self.read(e)
+
+    def read(self, entry):
+        if entry.segment is self.active:
+            with self.lock:
+                self.log.flush()
+        return entry.segment.read(entry)
+
+    def by_key(self, key):
+        """Hash-bucket candidates for a RelatedID or "R<RecordID>", in time order. Callers check the key."""
+        h = key_hash(key)
+        found = []
+        with self.lock:
+            segments = list(self.segments)
+            active_hits = list(self.active_keys.get(h, []))
+            active = self.active
+        for seg in segments:
+            if seg is active:
+                hits = active_hits
+            else:
+                hits = self._kdx_lookup(seg, h)
+            if not hits:
+                continue
+            with self.lock:
+                buf, n = self._mapped(seg)
+            try:
+                found.append([seg.entry(buf, i) for i in sorted(hits) if i < n])
+            finally:
+                if buf is not None:
+                    buf.close()
+        return list(heapq.merge(*found, key=lambda e: e.ts_ms))
+
+    def _kdx_lookup(self, seg, h):
+        if not seg.kdx_path.exists() or seg.kdx_path.stat().st_size == 0:
+            return []
+        with open(seg.kdx_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            n = len(buf) // KDX.size
+            keys = _KdxView(buf, n)
+            i = bisect.bisect_left(keys, h)
+            hits = []
+            while i < n:
+                k, entry_no = KDX.unpack_from(buf, i * KDX.size)
+                if k != h:
+                    break
+                hits.append(entry_no)
+                i += 1
+            return hits
+
+    def related_entries(self, related_id):
+        """Entries whose RelatedID is exactly related_id, in time order."""
+        related_id = str(related_id)
+        stored = stored_related(related_id)
+        found = []
+        for e in self.by_key(stored):
+            if e.related_id == stored and len(stored) < RELATED_BYTES:
+                found.append(e)
+                continue
+            if e.related_id != stored and e.faces <= 1:
+                continue        # hash collision
+            # truncated in the index, or another face's id: only the record has it
+            record = self.read(e)
+            if related_id in related_ids(record["path"], record["payload"]):
+                found.append(e)
+        return found
+
+    def by_related(self, related_id):
+        return [self.read(e) for e in self.related_entries(related_id)]
+
+    def by_record(self, record_id):
+        return [self.read(e) for e in self.by_key(f"R{record_id}") if e.record_id == int(record_id)]
+
+
+class _KdxView:
+    """Sequence of key hashes over a mapped .kdx so bisect can search it in place."""
+
+    def __init__(self, buf, n):
+        self.buf = buf
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return KDX.unpack_from(self.buf, i * KDX.size)[0]
+
+
+# ---- importer for the old one-file-per-event directory ----
+
+NEW_NAME = re.compile(r"^(\d{13})_evt\d+_(\w+?)\.json$")
+OLD_NAME = re.compile(r"^event_(\d{10})_\d+\.json$")
+
+
+def _load_event_file(p):
+    """Returns (ts_ms, path, payload) or None if the file isn't a notification."""
+    m_new = NEW_NAME.match(p.name)
+    m_old = OLD_NAME.match(p.name)
+    if not (m_new or m_old):
+        return None
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    ts_ms = int(m_new.group(1)) if m_new else int(m_old.group(1)) * 1000
+    path = None
+    if "payload" in data and isinstance(data["payload"], dict):
+        path = data.get("_path")
+        if data.get("_received_at"):
+            try:
+                ts_ms = int(datetime.fromisoformat(data["_received_at"]).timestamp() * 1000)
+            except ValueError:
+                pass
+        data = data["payload"]
+
+    if "AlarmInfo" in data:
+        path = path or "/LAPI/V1.0/System/Event/Notification/Alarm"
+    elif "PersonEventInfo" in data:
+        path = path or "/LAPI/V1.0/System/Event/Notification/PersonInfo"
+    else:
+        return None
+    return ts_ms, path, data
+
+
+def externalise_images(node, store):
+    """
+    Moves inline base64 "Data" images into store, leaving "DataFile" and
+    "DataSHA256" like the streaming receiver does. Data that isn't valid
+    base64 (e.g. redacted captures) is left as it is.
+    """
+    if isinstance(node, dict):
+        data = node.get("Data")
+        if isinstance(data, str) and data:
+            try:
+                raw = base64.b64decode(data)
+            except (binascii.Error, ValueError):
+                raw = b""
+            if raw:
+                digest = store.put_bytes(raw)
+                del node["Data"]
+                node["DataFile"] = str(store.path_for(digest))
+                node["DataSHA256"] = digest
+        for v in node.values():
+            externalise_images(v, store)
+    elif isinstance(node, list):
+        for v in node:
+            externalise_images(v, store)
+    return node
+
+
+def import_directory(journal, src_dir, store=None):
+    """
+    One-shot import of unv_events/-style files. Returns (imported, skipped).
+    With a BlobStore, inline images are stored there and journaled by reference.
+    """
+    events = []
+    skipped = 0
+    for p in Path(src_dir).glob("*.json"):
+        ev = _load_event_file(p)
+        if ev is None:
+            skipped += 1
+        else:
+            events.append(ev)
+    events.sort(key=lambda ev: ev[0])
+    for ts_ms, path, payload in events:
+        if store is not None:
+            externalise_images(payload, store)
+        journal.append(path, payload, ts_ms=ts_ms)
+    journal.sync()
+    return len(events), skipped
+
+
+def main():
+    ap = argparse.ArgumentParser(description="UNV event journal")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    imp = sub.add_parser("import", help="import a unv_events/ directory")
+    imp.add_argument("src")
+    imp.add_argument("journal")
+    imp.add_argument("--blobs", help="BlobStore for inline images (default: <journal>/blobs)")
+
+    q = sub.add_parser("query", help="list events from the index")
+    q.add_argument("journal")
+    q.add_argument("--start-ms", type=int)
+    q.add_argument("--end-ms", type=int)
+    q.add_argument("--channel", type=int)
+    q.add_argument("--face-match", action="store_true")
+    q.add_argument("--related")
+    args = ap.parse_args()
+
+    journal = EventJournal(args.journal)
+    if args.cmd == "import":
+        store = BlobStore(args.blobs or Path(args.journal) / "blobs")
+        imported, skipped = import_directory(journal, args.src, store)
+        print(f"Imported {imported} events ({skipped} files skipped) into {Path(args.journal).resolve()}")
+    elif args.related:
+        for e in journal.related_entries(args.related):
+            print(e.ts_ms, TYPE_NAMES.get(e.type), e.channel, e.record_id, e.related_id)
+    else:
+        types = FACE_MATCH_TYPES if args.face_match else None
+        for e in journal.entries(args.start_ms, args.end_ms, types, args.channel):
+            print(e.ts_ms, TYPE_NAMES.get(e.type), e.channel, e.record_id, e.related_id)
+    journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Event list for the FaceMatch GUI that stays responsive under event bursts.
+
+Receiver threads call push(); nothing touches Tk until the panel's after()
+tick, which drains the queue in one go, inserts the batch into a Treeview and
+trims it to max_rows (so Tk never holds more than that many items, however
+long it runs). If a tick finds more than max_rows new events, only the newest
+are inserted. Rows at or above popup_similarity also raise a single alert
+window, updated in place rather than stacking a new Toplevel per event. With a
+ThumbnailCache, the alert shows the faces named in the row's "Thumbs" keys
+once they have been decoded, checked on each tick.
+
+    panel = EventPanel(frame, max_rows=200, popup_similarity=90)
+    panel.pack(fill="both", expand=True)
+    panel.push({"Kind": "match", "PersonName": "patron_0012", "Similarity": 93.5, ...})
+"""
+import base64
+import collections
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+COLUMNS = (
+    ("Time", 70),
+    ("Kind", 60),
+    ("PersonName", 150),
+    ("Similarity", 70),
+    ("ChannelID", 60),
+    ("AlarmType", 110),
+    ("RelatedID", 90),
+)
+
+
+class EventPanel(ttk.Frame):
+    def __init__(self, parent, max_rows=200, tick_ms=100, popup_similarity=90.0, thumbnails=None, **kwargs):
+        super().__init__(parent, **kwargs)
+        self.max_rows = max_rows
+        self.tick_ms = tick_ms
+        self.popup_similarity = popup_similarity
+        self.thumbnails = thumbnails
+
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+        self.total = 0
+        self.rate = 0.0
+        self.rate_at = time.monotonic()
+        self.rate_count = 0
+        self.alert = None
+        self.alert_keys = []        # thumbnail keys not yet shown in the alert
+
+        self.tree = ttk.Treeview(self, columns=[c for c, _ in COLUMNS], show="headings", height=10)
+        for col, width in COLUMNS:
+            self.tree.heading(col, text=col)
+            self.tree.column(col, width=width, anchor="w", stretch=col == "PersonName")
+        self.tree.tag_configure("hit", background="#ffe0e0")
+        scroll = ttk.Scrollbar(self, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scroll.set)
+        self.summary = tk.StringVar(value="No events yet")
+
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        scroll.grid(row=0, column=1, sticky="ns")
+        ttk.Label(self, textvariable=self.summary).grid(row=1, column=0, columnspan=2, sticky="w")
+        self.rowconfigure(0, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.after(self.tick_ms, self._tick)
+
+    def push(self, row):
+        """Thread-safe; row is a dict keyed by the COLUMNS names."""
+        row.setdefault("Time", time.strftime("%H:%M:%S"))
+        with self.lock:
+            self.pending.append(row)
+
+    def _tick(self):
+        with self.lock:
+            batch = self.pending
+            self.pending = collections.deque()
+        try:
+            if batch:
+                self._render(batch)
+            if self.alert_keys:
+                self._show_thumbnails()
+            self._update_summary(len(batch))
+        finally:
+            self.after(self.tick_ms, self._tick)
+
+    def _render(self, batch):
+        self.total += len(batch)
+        hits = [r for r in batch if self.is_hit(r)]
+
+        # anything older than the newest max_rows would be trimmed straight away
+        shown = list(batch)[-self.max_rows:]
+        for r in shown:
+            self.tree.insert("", 0, values=[r.get(c, "") for c, _ in COLUMNS],
+                             tags=("hit",) if self.is_hit(r) else ())
+        children = self.tree.get_children()
+        if len(children) > self.max_rows:
+            self.tree.delete(*children[self.max_rows:])
+
+        if hits:
+            self._show_alert(hits[-1], len(hits) - 1)
+
+    def is_hit(self, row):
+        try:
+            return float(row.get("Similarity")) >= self.popup_similarity
+        except (TypeError, ValueError):
+            return False
+
+    def _show_alert(self, row, more):
+        if self.alert is None or not self.alert.winfo_exists():
+            self.alert = tk.Toplevel(self)
+            self.alert.title("FACE MATCH")
+            self.alert.attributes("-topmost", True)
+            box = ttk.Frame(self.alert, padding=12)
+            box.pack(fill="both", expand=True)
+            ttk.Label(box, text="FACE MATCH", font=("Segoe UI", 16, "bold")).pack(anchor="w")
+            self.alert_text = tk.StringVar()
+            ttk.Label(box, textvariable=self.alert_text, font=("Segoe UI", 11), justify="left").pack(anchor="w")
+            self.alert_faces = ttk.Frame(box)
+            self.alert_faces.pack(anchor="w", pady=(6, 0))
+            ttk.Button(box, text="OK", command=self.alert.destroy).pack(anchor="w", pady=(10, 0))
+
+        lines = [
+            f"Name: {row.get('PersonName')}",
+            f"Similarity: {row.get('Similarity')}",
+            f"ChannelID: {row.get('ChannelID')}",
+            f"AlarmType: {row.get('AlarmType')}",
+            f"RelatedID: {row.get('RelatedID')}",
+            f"Time: {row.get('Time')}",
+        ]
+        if more:
+            lines.append(f"(+{more} more matches this tick)")
+        self.alert_text.set("\n".join(lines))
+        for w in self.alert_faces.winfo_children():
+            w.destroy()
+        self.alert_photos = []
+        self.alert_keys = list(row.get("Thumbs", ())) if self.thumbnails is not None else []
+        self._show_thumbnails()
+        self.alert.lift()
+
+    def _show_thumbnails(self):
+        if self.alert is None or not self.alert.winfo_exists():
+            self.alert_keys = []
+            return
+        missing = []
+        for key in self.alert_keys:
+            png = self.thumbnails.get(key)
+            if png is None:
+                missing.append(key)
+                continue
+            photo = tk.PhotoImage(data=base64.b64encode(png))
+            self.alert_photos.append(photo)     # Tk drops images nobody references
+            ttk.Label(self.alert_faces, image=photo).pack(side="left", padx=(0, 6))
+        self.alert_keys = missing
+
+    def _update_summary(self, n):
+        self.rate_count += n
+        now = time.monotonic()
+        if now - self.rate_at >= 1.0:
+            self.rate = self.rate_count / (now - self.rate_at)
+            self.rate_at = now
+            self.rate_count = 0
+            self.summary.set(f"{self.total} events, {self.rate:.0f}/s, "
+                             f"showing newest {min(self.total, self.max_rows)}")
@@ -0,0 +1,187 @@
+"""
+Bounded hand-off between the receiver and on_event.
+
+    events = EventQueue(on_event, maxsize=1000, workers=2, policy="drop-oldest")
+    run_receiver(LISTEN_HOST, LISTEN_PORT, events.put)
+
+put() only appends to an in-memory deque, so the receiver acks immediately;
+worker threads call on_event. When the queue is full the policy decides:
+    "drop-oldest"  discard the oldest queued event
+    "block"        wait for a free slot (don't use with the asyncio receiver)
+    "spill"        write the event to spill_dir and replay it once there is room
+
+Spill files are written and read outside the queue lock, so disk I/O never
+holds up the receiver or the other workers. Files left in spill_dir by a
+previous run are replayed first, oldest first.
+"""
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+POLICIES = ("drop-oldest", "block", "spill")
+
+
+class EventQueue:
+    def __init__(self, on_event, maxsize=1000, workers=2, policy="drop-oldest", spill_dir=None):
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {POLICIES}")
+        if policy == "spill" and spill_dir is None:
+            raise ValueError("spill policy needs spill_dir")
+
+        self.on_event = on_event
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+        self.items = deque()
+        self.spilled = deque()      # spill file paths, oldest first
+        self.writing = set()        # reserved in spilled but not on disk yet
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        self.stopping = False
+
+        self.counters = {
+            "enqueued": 0,
+            "processed": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "errors": 0,
+            "max_depth": 0,
+        }
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+        if self.spill_dir:
+            for leftover in self.spill_dir.glob("*.json.part"):
+                leftover.unlink()       # interrupted write; the event was never acked as queued
+            self.spilled.extend(sorted(self.spill_dir.glob("*.json")))
+
+        self.threads = []
+        for n in range(workers):
+            t = threading.Thread(target=self._worker, name=f"event-worker-{n}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    def put(self, path, payload):
+        name = None
+        with self.cond:
+            if len(self.items) >= self.maxsize:
+                if self.policy == "drop-oldest":
+                    self.items.popleft()
+                    self.counters["dropped"] += 1
+                elif self.policy == "block":
+                    while len(self.items) >= self.maxsize and not self.stopping:
+                        self.cond.wait()
+                else:
+                    name = self._reserve()
+            elif self.spilled:
+                # keep FIFO order: anything arriving behind spilled events spills too
+                name = self._reserve()
+
+            if name is None:
+                self.items.append((time.monotonic(), path, payload))
+                self.counters["enqueued"] += 1
+                self.counters["max_depth"] = max(self.counters["max_depth"], len(self.items))
+                self.cond.notify_all()
+                return
+        self._spill(name, path, payload)
+
+    def _reserve(self):
+        """Called with the lock held. Takes the next place in the spill order; the file is written later."""
+        name = self.spill_dir / f"{time.time_ns()}_{next(self.seq):08d}.json"
+        self.spilled.append(name)
+        self.writing.add(name)
+        return name
+
+    def _spill(self, name, path, payload):
+        tmp = name.with_name(name.name + ".part")
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"queued_wall": time.time(), "path": path, "payload": payload}, f)
+            os.replace(tmp, name)
+            ok = True
+        except Exception as e:
+            print("spill error:", e)
+            ok = False
+        with self.cond:
+            self.writing.discard(name)
+            self.counters["spilled" if ok else "errors"] += 1
+            if not ok:
+                self.spilled.remove(name)
+            self.cond.notify_all()
+
+    def _load(self, name):
+        """Reads and removes one spill file. Returns (queued_at, path, payload), or None if unreadable."""
+        try:
+            with open(name, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            os.remove(name)
+        except Exception:
+            with self.cond:
+                self.counters["errors"] += 1
+            return None
+        # wall clock on disk, so the wait stays meaningful across a restart
+        queued_at = time.monotonic() - max(0.0, time.time() - data["queued_wall"])
+        return queued_at, data["path"], data["payload"]
+
+    def _next(self):
+        """Called with the lock held. Returns (queued_at, path, payload), a spill file path, or None when stopping."""
+        while True:
+            if self.items:
+                item = self.items.popleft()
+                self.cond.notify_all()
+                return item
+            if self.spilled and self.spilled[0] not in self.writing:
+                return self.spilled.popleft()       # a Path; the worker reads it outside the lock
+            if self.stopping:
+                return None
+            self.cond.wait()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                item = self._next()
+            if item is None:
+                return
+            if isinstance(item, Path):
+                item = self._load(item)
+                if item is None:
+                    continue
+
+            queued_at, path, payload = item
+            waited = time.monotonic() - queued_at
+            try:
+                self.on_event(path, payload)
+                ok = True
+            except Exception as e:
+                print("on_event error:", e)
+                ok = False
+
+            with self.cond:
+                self.counters["processed" if ok else "errors"] += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self):
+        with self.cond:
+            done = self.counters["processed"] + self.counters["errors"]
+            return {
+                **self.counters,
+                "depth": len(self.items),
+                "spill_depth": len(self.spilled),
+                "wait_avg_ms": (self.wait_total / done * 1000) if done else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+    def stop(self, timeout=5):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        for t in self.threads:
+            t.join(timeout)
@@ -1,33 +1,31 @@
 import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-import time
 
-from unv_client import UNVClient
+from correlator import Correlator
+from event_journal import EventJournal
+from event_panel import EventPanel
+from event_queue import EventQueue
+from subscription_manager import SubscriptionManager
+from thumbnails import ThumbnailCache, face_sources
 from unv_receiver import run_receiver
 
 LISTEN_HOST = "0.0.0.0"
 LISTEN_PORT = 9000
-
-def popup(parent, title, lines):
-    win = tk.Toplevel(parent)
-    win.title(title)
-    win.attributes("-topmost", True)
-
-    box = ttk.Frame(win, padding=12)
-    box.pack(fill="both", expand=True)
-
-    ttk.Label(box, text=title, font=("Segoe UI", 16, "bold")).pack(anchor="w")
-    for line in lines:
-        ttk.Label(box, text=line, font=("Segoe UI", 11)).pack(anchor="w")
-
-    ttk.Button(box, text="OK", command=win.destroy).pack(anchor="w", pady=(10, 0))
-
+RECEIVER_MODE = "asyncio"   # or "thread" for the old ThreadingHTTPServer
+EVENT_QUEUE_SIZE = 500
+SPILL_DIR = "face_images"   # inline base64 images are written here instead of kept in the payload
+JOURNAL_DIR = "journal"
+SUB_DURATION_S = 3000       # renewed at 80% of this by SubscriptionManager
+MATCH_WINDOW_S = 5          # how long an Alarm waits for its PersonInfo (and vice versa)
+POPUP_SIMILARITY = 90.0     # only matches at or above this raise the alert window; the rest are just listed
+EVENT_ROWS = 200            # rows kept in the event list
+THUMB_DIR = "thumbs"        # decoded face thumbnails, keyed by image content hash (size-bounded)
 
 def main():
     root = tk.Tk()
     root.title("UNV FaceMatch")
-    root.geometry("520x300")
+    root.geometry("720x560")
 
     nvr_ip = tk.StringVar()
     username = tk.StringVar(value="admin")
@@ -49,89 +47,77 @@ def main():
     status = tk.StringVar(value="Idle")
     ttk.Label(frm, textvariable=status).grid(row=7, column=0, columnspan=2, sticky="w", pady=(10, 0))
 
-    stop_keepalive = threading.Event()
+    thumbs = ThumbnailCache(THUMB_DIR)
+    panel = EventPanel(frm, max_rows=EVENT_ROWS, popup_similarity=POPUP_SIMILARITY, thumbnails=thumbs)
+    panel.grid(row=8, column=0, columnspan=2, sticky="nsew", pady=(10, 0))
+    frm.rowconfigure(8, weight=1)
+    frm.columnconfigure(1, weight=1)
 
-    # these are set after Start
-    session = None
-    sub_id = None
-    client_ip_saved = None
+    # set after Start
+    manager = None
+    nvr_saved = None
     receiver_started = False
+    journal = EventJournal(JOURNAL_DIR)
+
+
+    # called from correlator/receiver threads; the panel renders on its own Tk tick
+    def on_match(rec):
+        keys = []
+        if panel.is_hit(rec):
+            # decode now, on the thumbnail workers, so the alert usually finds them ready
+            for key, source in face_sources(rec["face"]):
+                thumbs.request(key, source)
+                keys.append(key)
+        panel.push({
+            "Kind": "match",
+            "PersonName": rec.get("PersonName"),
+            "Similarity": rec.get("Similarity"),
+            "ChannelID": rec.get("ChannelID"),
+            "AlarmType": rec.get("AlarmType"),
+            "RelatedID": rec.get("RelatedID"),
+            "Thumbs": keys,
+        })
+
+    def on_unmatched(kind, related_id, part):
+        if kind == "alarm":
+            ai = part.get("AlarmInfo", {})
+            panel.push({
+                "Kind": "alarm",
+                "AlarmType": ai.get("AlarmType"),
+                "ChannelID": ai.get("AlarmSrcID"),
+                "RelatedID": ai.get("RelatedID"),
+            })
+        else:
+            compare = part.get("CompareInfo", {})
+            person = compare.get("PersonInfo", {})
+            panel.push({
+                "Kind": "person",
+                "PersonName": person.get("PersonName"),
+                "Similarity": compare.get("Similarity"),
+                "ChannelID": part.get("ChannelID"),
+                "RelatedID": part.get("RelatedID"),
+            })
+
+    correlator = Correlator(on_match, on_unmatched, window_s=MATCH_WINDOW_S)
+    correlator.start()
 
 
     def on_event(path, payload):
-        def show():
-            if path.endswith("/System/Event/Notification/Alarm"):
-                ai = payload.get("AlarmInfo", {})
-                popup(root, "ALARM", [
-                    f"AlarmType: {ai.get('AlarmType')}",
-                    f"AlarmSrcID: {ai.get('AlarmSrcID')}",
-                    f"RelatedID: {ai.get('RelatedID')}",
-                ])
-
-            elif path.endswith("/System/Event/Notification/PersonInfo"):
-                pei = payload.get("PersonEventInfo", {})
-                face_list = pei.get("FaceInfoList", [])
-                f0 = face_list[0] if face_list else {}
-                compare = f0.get("CompareInfo", {})
-                person = compare.get("PersonInfo", {})
-
-                popup(root, "PERSON INFO", [
-                    f"Name: {person.get('PersonName')}",
-                    f"Similarity: {compare.get('Similarity')}",
-                    f"ChannelID: {f0.get('ChannelID')}",
-                    f"RelatedID: {f0.get('RelatedID')}",
-                ])
-
-        root.after(0, show)
+        journal.append(path, payload)
+        correlator.feed(path, payload)
 
 
-    def do_subscribe(show_popup=True):
-        nonlocal session, sub_id, client_ip_saved
-
-        if session is None or client_ip_saved is None:
-            return
-
-        resp = session.subscribe(client_ip_saved, LISTEN_PORT)
-        data = resp.get("Response", {}).get("Data", {})  # {"ID":..., "Reference":..., ...}
-        sub_id = data.get("ID")
-
-        status.set(f"Subscribed OK. ID={sub_id}")
-        if show_popup:
-            popup(root, "SUBSCRIBED", [str(data)])
-
-
-    def keepalive_loop():
-        nonlocal sub_id
-        # renew before 3000s expires (simple)
-        while not stop_keepalive.is_set():
-            time.sleep(2400)
-
-            if stop_keepalive.is_set():
-                break
-
-            # If we don't have a sub_id yet, try subscribe
-            if sub_id is None:
-                try:
-                    root.after(0, lambda: status.set("Re-subscribing..."))
-                    do_subscribe(show_popup=False)
-                except Exception:
-                    continue
-                continue
-
-            # Try renew; if it fails, re-subscribe
-            try:
-                session.renew_subscription(sub_id, duration_s=3000)
-                root.after(0, lambda: status.set(f"Renewed subscription. ID={sub_id}"))
-            except Exception:
-                try:
-                    root.after(0, lambda: status.set("Renew failed -> re-subscribing..."))
-                    do_subscribe(show_popup=False)
-                except Exception:
-                    pass
+    def on_subscription_change(state):
+        def show():
+            if state["status"] == "active":
+                status.set(f"Subscribed OK. ID={state['sub_id']}")
+            else:
+                status.set(f"Subscription {state['status']} ({state['failures']} failures): {state['last_error']}")
+        root.after(0, show)
 
 
     def start():
-        nonlocal session, receiver_started, client_ip_saved
+        nonlocal manager, receiver_started, nvr_saved
 
         ip = nvr_ip.get().strip()
         user = username.get().strip()
@@ -143,32 +129,34 @@ def main():
             return
 
         if not receiver_started:
+            events = EventQueue(on_event, maxsize=EVENT_QUEUE_SIZE, workers=1, policy="drop-oldest")
             threading.Thread(
                 target=run_receiver,
-                args=(LISTEN_HOST, LISTEN_PORT, on_event),
+                args=(LISTEN_HOST, LISTEN_PORT, events.put, RECEIVER_MODE, SPILL_DIR),
                 daemon=True
             ).start()
             receiver_started = True
             status.set(f"Receiver listening on {LISTEN_HOST}:{LISTEN_PORT}")
 
-        session = UNVClient(ip, user, pw)
-        client_ip_saved = client_ip
-
-        try:
-            do_subscribe(show_popup=True)
-        except Exception as e:
-            popup(root, "ERROR", [str(e)])
-            return
+        if manager is None or manager.callback_ip != client_ip:
+            if manager is not None:
+                manager.stop()
+            manager = SubscriptionManager(client_ip, LISTEN_PORT, duration_s=SUB_DURATION_S,
+                                          on_change=on_subscription_change)
+            manager.start()
+        elif nvr_saved and nvr_saved != ip:
+            manager.remove(nvr_saved)
 
-        stop_keepalive.clear()
-        threading.Thread(target=keepalive_loop, daemon=True).start()
+        nvr_saved = ip
+        manager.add(ip, user, pw)
+        status.set("Subscribing...")
 
 
     def resubscribe_button():
-        try:
-            do_subscribe(show_popup=True)
-        except Exception as e:
-            popup(root, "ERROR", [str(e)])
+        if manager is None or nvr_saved is None:
+            return
+        status.set("Re-subscribing...")
+        manager.resubscribe(nvr_saved)
 
 
     ttk.Button(frm, text="Start (Receiver + Subscribe)", command=start).grid(
@@ -179,6 +167,9 @@ def main():
     )
 
     root.mainloop()
+    # the window is gone; write out what's still buffered
+    journal.close()
+    thumbs.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Concurrent, resumable image download stage for image_scraper.
+
+Downloads run as asyncio tasks behind a global concurrency semaphore and a
+per-host rate limit. Bodies are written off the event loop (temp file, then
+rename), so a half-written file never looks complete. Finished files are
+skipped on the next run; with revalidate=True they are re-requested with
+If-None-Match / If-Modified-Since and a 304 leaves them alone. With a
+PhashIndex as `dedupe`, an image that near-duplicates one already saved is
+recorded as a link to it instead of being written again. Validators are
+checkpointed to disk every CHECKPOINT_EVERY changes / CHECKPOINT_S seconds,
+so an interrupted run keeps what it learned.
+
+Jobs may carry a page label as a third element; a page counts as done when
+its last image has finished (a plain run() is one page).
+
+fetch(url, headers) is any coroutine returning (status, headers, body), so the
+same stage runs over Playwright's logged-in page.request or plain urllib:
+
+    dl = Downloader("monty_RSL", urllib_fetch, concurrency=8, per_host_rate=5)
+    await dl.run([("http://127.0.0.1:8000/a.jpg", "patron_0000.jpg"), ...])
+    print(dl.summary())
+"""
+import asyncio
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+VALIDATORS_NAME = ".validators.json"
+CHECKPOINT_EVERY = 50       # validator changes between saves
+CHECKPOINT_S = 10.0
+
+
+async def urllib_fetch(url, headers, timeout=30):
+    def get():
+        req = urllib.request.Request(url, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as r:
+                return r.status, dict(r.headers), r.read()
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers or {}), b""
+    return await asyncio.to_thread(get)
+
+
+class HostLimiter:
+    """At most `rate` request starts per second per host (0 = unlimited)."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = {}
+        self.locks = {}
+
+    async def wait(self, host):
+        if not self.interval:
+            return
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            at = max(now, self.next_at.get(host, 0.0))
+            self.next_at[host] = at + self.interval
+        if at > now:
+            await asyncio.sleep(at - now)
+
+
+def _write_file(path, body):
+    tmp = path + ".part"
+    with open(tmp, "wb") as f:
+        f.write(body)
+    os.replace(tmp, path)
+
+
+class Downloader:
+    def __init__(self, save_folder, fetch, concurrency=8, per_host_rate=5.0, retries=2, revalidate=False,
+                 verbose=True, dedupe=None):
+        self.save_folder = save_folder
+        self.fetch = fetch
+        self.concurrency = concurrency
+        self.limiter = HostLimiter(per_host_rate)
+        self.retries = retries
+        self.revalidate = revalidate
+        self.verbose = verbose
+        self.dedupe = dedupe
+        os.makedirs(save_folder, exist_ok=True)
+
+        # filename -> {"url", "etag", "last_modified"[, "duplicate_of"]} from the last successful download
+        self.validators_path = os.path.join(save_folder, VALIDATORS_NAME)
+        self.validators = {}
+        if os.path.exists(self.validators_path):
+            try:
+                with open(self.validators_path, "r", encoding="utf-8") as f:
+                    self.validators = json.load(f)
+            except ValueError:
+                self.validators = {}
+
+        self.dirty = 0
+        self.saved_at = time.monotonic()
+        self.save_lock = None
+
+        self.pages = 0
+        self.counters = {"downloaded": 0, "skipped": 0, "not_modified": 0, "duplicates": 0, "failed": 0,
+                         "bytes": 0}
+        self.started = time.perf_counter()
+
+    def page_done(self):
+        self.pages += 1
+
+    async def run(self, jobs):
+        """jobs: iterable of (url, filename) or (url, filename, page). Returns the number of files written."""
+        sem = asyncio.Semaphore(self.concurrency)
+        self.save_lock = asyncio.Lock()
+        jobs = [(job[0], job[1], job[2] if len(job) > 2 else None) for job in jobs]
+        remaining = {}
+        for _, _, page in jobs:
+            remaining[page] = remaining.get(page, 0) + 1
+
+        async def one(url, filename, page):
+            async with sem:
+                await self._download(url, filename)
+            remaining[page] -= 1
+            if not remaining[page]:
+                self.page_done()
+            await self._checkpoint()
+
+        before = self.counters["downloaded"]
+        try:
+            await asyncio.gather(*(one(*job) for job in jobs))
+        finally:
+            await self._checkpoint(force=True)
+        return self.counters["downloaded"] - before
+
+    async def _checkpoint(self, force=False):
+        if not self.dirty:
+            return
+        if not force and self.dirty < CHECKPOINT_EVERY and time.monotonic() - self.saved_at < CHECKPOINT_S:
+            return
+        async with self.save_lock:
+            if not self.dirty:
+                return
+            # snapshot on the loop thread; the write happens off it
+            snapshot, self.dirty, self.saved_at = dict(self.validators), 0, time.monotonic()
+            await asyncio.to_thread(self._save_validators, snapshot)
+
+    async def _download(self, url, filename):
+        path = os.path.join(self.save_folder, filename)
+        known = self.validators.get(filename)
+        headers = {}
+        if known and known.get("duplicate_of") and known.get("url") == url and not self.revalidate:
+            self.counters["skipped"] += 1
+            return
+        if os.path.exists(path):
+            if not self.revalidate or not known or known.get("url") != url:
+                self.counters["skipped"] += 1
+                return
+            if known.get("etag"):
+                headers["If-None-Match"] = known["etag"]
+            if known.get("last_modified"):
+                headers["If-Modified-Since"] = known["last_modified"]
+
+        host = urlsplit(url).netloc
+        for attempt in range(self.retries + 1):
+            await self.limiter.wait(host)
+            try:
+                status, resp_headers, body = await self.fetch(url, headers)
+            except Exception as e:
+                error = e
+            else:
+                if status == 304:
+                    self.counters["not_modified"] += 1
+                    return
+                if 200 <= status < 300:
+                    h = {k.lower(): v for k, v in resp_headers.items()}
+                    self.validators[filename] = {"url": url, "etag": h.get("etag"),
+                                                 "last_modified": h.get("last-modified")}
+                    self.dirty += 1
+                    dup = await self._duplicate_of(filename, body)
+                    if dup is not None:
+                        self.validators[filename]["duplicate_of"] = dup
+                        self.counters["duplicates"] += 1
+                        if self.verbose:
+                            print(f"Duplicate: {filename} -> {dup}")
+                        return
+                    await asyncio.to_thread(_write_file, path, body)
+                    self.counters["downloaded"] += 1
+                    self.counters["bytes"] += len(body)
+                    if self.verbose:
+                        print(f"Downloaded: {filename}")
+                    return
+                error = f"HTTP {status}"
+                if status < 500 and status != 429:
+                    break   # not worth retrying
+            if attempt < self.retries:
+                await asyncio.sleep(0.5 * 2 ** attempt)
+        self.counters["failed"] += 1
+        print(f"Failed to download {url}: {error}")
+
+    async def _duplicate_of(self, filename, body):
+        if self.dedupe is None:
+            return None
+        try:
+            return await asyncio.to_thread(self.dedupe.check_bytes, filename, body)
+        except Exception as e:
+            print(f"Could not hash {filename}: {e}")   # not an image we can decode; keep it
+            return None
+
+    def _save_validators(self, validators):
+        tmp = self.validators_path + ".part"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(validators, f)
+        os.replace(tmp, self.validators_path)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        c = self.counters
+        return (f"{self.pages} pages, {c['downloaded']} images downloaded, {c['skipped']} already present, "
+                f"{c['not_modified']} not modified, {c['duplicates']} duplicates, {c['failed']} failed, {c['bytes'] / 1e6:.1f} MB "
+                f"in {elapsed:.1f} s ({self.pages / elapsed:.2f} pages/s, {c['downloaded'] / elapsed:.1f} images/s)")
@@ -0,0 +1,140 @@
+"""
+Shrinks enrolment photos to what the NVR actually uses before they are uploaded.
+
+Each image is rotated per its EXIF orientation, downscaled so the long side is
+at most max_side, and re-encoded as a baseline JPEG with no EXIF, stepping the
+quality down until it fits target_bytes. Work runs in a process pool; results
+go into the BlobStore and a small index maps (source sha256, settings) to the
+output, so reruns only touch new or changed photos.
+
+Needs Pillow; without it the stage passes images through untouched.
+
+    norm = Normaliser(store, max_side=640, target_bytes=120 * 1024)
+    for item in norm.stage(items):      # items carry "dst" and "sha256"
+        item["upload"]                  # path of the normalised JPEG
+    print(norm.summary())
+"""
+import io
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+MAX_SIDE = 640                  # px on the long side; face detection on UNV wants far less
+TARGET_BYTES = 120 * 1024       # upper bound per enrolment image
+QUALITIES = (90, 85, 80, 75, 70, 60, 50)
+INDEX_NAME = "normalised.jsonl"
+
+
+def normalise_bytes(raw, max_side=MAX_SIDE, target_bytes=TARGET_BYTES):
+    """Returns the re-encoded JPEG bytes for one image."""
+    with Image.open(io.BytesIO(raw)) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        im.thumbnail((max_side, max_side), Image.LANCZOS)
+        out = b""
+        for q in QUALITIES:
+            buf = io.BytesIO()
+            im.save(buf, "JPEG", quality=q, optimize=True)   # no exif= -> metadata dropped
+            out = buf.getvalue()
+            if len(out) <= target_bytes:
+                break
+        return out
+
+
+def _normalise_path(path, max_side, target_bytes):
+    """Process-pool entry point: read, normalise, return bytes (small enough to pickle cheaply)."""
+    with open(path, "rb") as f:
+        return normalise_bytes(f.read(), max_side, target_bytes)
+
+
+class Normaliser:
+    def __init__(self, store, max_side=MAX_SIDE, target_bytes=TARGET_BYTES, workers=None):
+        self.store = store
+        self.max_side = max_side
+        self.target_bytes = target_bytes
+        self.workers = workers or os.cpu_count() or 1
+        self.settings = f"{max_side}px/{target_bytes}B"
+        self.lock = threading.Lock()
+
+        self.index_path = store.root / INDEX_NAME
+        self.index = {}         # (source sha256, settings) -> output sha256
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.index[(rec["Source"], rec["Settings"])] = rec["Output"]
+
+        self.counters = {"converted": 0, "cached": 0, "failed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def cached(self, sha256):
+        out = self.index.get((sha256, self.settings))
+        return out if out is not None and self.store.has(out) else None
+
+    def _remember(self, sha256, out):
+        with self.lock:
+            self.index[(sha256, self.settings)] = out
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"Source": sha256, "Settings": self.settings, "Output": out}) + "\n")
+
+    def _finish(self, item, out):
+        self.counters["bytes_in"] += item["dst"].stat().st_size
+        self.counters["bytes_out"] += self.store.path_for(out).stat().st_size
+        item["upload"] = self.store.path_for(out)
+        return item
+
+    def stage(self, items):
+        """
+        Pipeline stage: sets item["upload"] to the normalised image, keeping
+        input order. At most 2 * workers images are being converted at once.
+        """
+        if Image is None:
+            print("Pillow not installed; uploading images unchanged (pip install Pillow)")
+            yield from items
+            return
+
+        pending = deque()       # (item, future or cached output sha256)
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for item in items:
+                out = self.cached(item["sha256"])
+                if out is not None:
+                    pending.append((item, out))
+                else:
+                    pending.append((item, pool.submit(_normalise_path, item["dst"],
+                                                      self.max_side, self.target_bytes)))
+                while len(pending) > 2 * self.workers or (pending and isinstance(pending[0][1], str)):
+                    yield self._resolve(*pending.popleft())
+            while pending:
+                yield self._resolve(*pending.popleft())
+
+    def _resolve(self, item, job):
+        if isinstance(job, str):
+            self.counters["cached"] += 1
+            return self._finish(item, job)
+        try:
+            raw = job.result()
+        except Exception as e:
+            # unreadable or not really an image: send the original and let the NVR decide
+            self.counters["failed"] += 1
+            print(f"Normalise failed for {item['name']}: {e}")
+            return item
+        out = self.store.put_bytes(raw)
+        self._remember(item["sha256"], out)
+        self.counters["converted"] += 1
+        return self._finish(item, out)
+
+    def summary(self):
+        c = self.counters
+        ratio = c["bytes_in"] / c["bytes_out"] if c["bytes_out"] else 1.0
+        return (f"Normalised {c['converted']} images ({c['cached']} cached, {c['failed']} failed): "
+                f"{c['bytes_in'] / 1e6:.1f} MB -> {c['bytes_out'] / 1e6:.1f} MB ({ratio:.1f}x smaller)")
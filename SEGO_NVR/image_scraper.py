@@ -2,15 +2,30 @@ import asyncio
 import os
 from playwright.async_api import async_playwright
 
+from image_downloader import Downloader
+from phash_index import Image, PhashIndex
+
 # ── CONFIGURATION ──────────────────────────────────────────────
 USERNAME = "123"
 PASSWORD = "123"
 SAVE_FOLDER = "monty_RSL" 
 LOGIN_URL = "https://www.unsplash.com"
 PATRON_URL = "https://www.imdb.com/search/name/"
+CONCURRENCY = 8          # image downloads in flight
+PER_HOST_RATE = 5.0      # request starts per second per host
+REVALIDATE = False       # True: re-check existing files with ETag / Last-Modified
+NEAR_DUP_RADIUS = 0      # dHash bits; near-duplicates are linked, not saved (0 = off; opt-in, needs Pillow)
 
 # ───────────────────────────────────────────────────────────────
 
+def playwright_fetch(page):
+    """Downloads through the page's request context, so login cookies apply."""
+    async def fetch(url, headers):
+        response = await page.request.get(url, headers=headers)
+        return response.status, response.headers, await response.body()
+    return fetch
+
+
 async def main():
 
     os.makedirs(SAVE_FOLDER, exist_ok=True)
@@ -52,8 +67,14 @@ async def main():
         images = await page.query_selector_all("img")
         print(f"Found {len(images)} images total")
 
-    #Download each image
-        downloaded = 0
+        dedupe = None
+        if NEAR_DUP_RADIUS and Image is not None:
+            dedupe = PhashIndex(os.path.join(SAVE_FOLDER, ".phash.jsonl"), radius=NEAR_DUP_RADIUS)
+        downloader = Downloader(SAVE_FOLDER, playwright_fetch(page), concurrency=CONCURRENCY,
+                                per_host_rate=PER_HOST_RATE, revalidate=REVALIDATE, dedupe=dedupe)
+
+    #Queue each image
+        jobs = []
         for i, img in enumerate(images):
             src = await img.get_attribute("src")
 
@@ -65,20 +86,13 @@ async def main():
             if src.startswith("/"):
                 src = "https://venues-sego.ahavic.com.au" + src
 
-            # Download the image
-            try:
-                response = await page.request.get(src)
-                if response.ok:
-                    filename = f"patron_{i:04d}.jpg"
-                    filepath = os.path.join(SAVE_FOLDER, filename)
-                    with open(filepath, "wb") as f:
-                        f.write(await response.body())
-                    downloaded += 1
-                    print(f"Downloaded: {filename}")
-            except Exception as e:
-                print(f"Failed to download image {i}: {e}")
+            jobs.append((src, f"patron_{i:04d}.jpg"))
+
+    #Download them concurrently
+        downloaded = await downloader.run(jobs)
 
         print(f"\n Downloaded {downloaded} images to '{SAVE_FOLDER}' folder")
+        print(downloader.summary())
         await browser.close()
 
 # Run the script
@@ -0,0 +1,236 @@
+"""
+Minimal stand-in for a UNV NVR's LAPI, for benchmarks and local testing.
+
+Speaks HTTP/1.1 keep-alive with RFC 2617 digest auth (qop=auth, nonces go
+stale after nonce_lifetime seconds) and answers the endpoints UNVClient and
+bulkimport use. Counts TCP connections, HTTP requests and 401 challenges.
+
+    server = MockLAPI(port=0, delay=0.002).start()
+    client = UNVClient(f"127.0.0.1:{server.port}", "admin", "admin")
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REALM = "mock-nvr"
+
+
+def md5(s):
+    return hashlib.md5(s.encode("utf-8")).hexdigest()
+
+
+def lapi_response(url, data=None, code=0):
+    return {"Response": {
+        "ResponseURL": url,
+        "CreatedID": -1,
+        "ResponseCode": code,
+        "SubResponseCode": 0,
+        "ResponseString": "Succeed" if code == 0 else "Failed",
+        "StatusCode": code,
+        "StatusString": "Succeed" if code == 0 else "Failed",
+        "Data": data if data is not None else "null",
+    }}
+
+
+class MockLAPI:
+    def __init__(self, host="127.0.0.1", port=0, username="admin", password="admin",
+                 delay=0.0, nonce_lifetime=300.0, max_batch=None):
+        self.username = username
+        self.password = password
+        self.delay = delay
+        self.nonce_lifetime = nonce_lifetime
+        self.max_batch = max_batch  # larger PersonInfoList uploads get a 599 app error
+        self.lock = threading.Lock()
+
+        self.nonces = {}            # nonce -> (issued_at, highest nc seen)
+        self.subscriptions = {}
+        self.people = {}            # LibID -> {PersonID: person}
+        self.next_sub = 1
+        self.fail_next = 0          # answer the next N requests with HTTP 500
+        self.counters = {"connections": 0, "requests": 0, "challenges": 0}
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reset_counters(self):
+        with self.lock:
+            for k in self.counters:
+                self.counters[k] = 0
+
+    # ---- digest auth ----
+
+    def _new_nonce(self):
+        nonce = os.urandom(16).hex()
+        self.nonces[nonce] = (time.monotonic(), 0)
+        return nonce
+
+    def _check_auth(self, method, header):
+        """Returns None if authorised, else the value of 'stale' for the challenge."""
+        if not header or not header.startswith("Digest "):
+            return False
+        fields = dict(re.findall(r'(\w+)="?([^",]*)"?', header[7:]))
+        nonce = fields.get("nonce")
+        with self.lock:
+            issued = self.nonces.get(nonce)
+            if issued is None:
+                return True
+            issued_at, last_nc = issued
+            if time.monotonic() - issued_at > self.nonce_lifetime:
+                del self.nonces[nonce]
+                return True
+            nc = int(fields.get("nc", "0"), 16)
+            if nc <= last_nc:
+                return False  # replayed nc
+            ha1 = md5(f"{self.username}:{REALM}:{self.password}")
+            ha2 = md5(f"{method}:{fields.get('uri')}")
+            expected = md5(f"{ha1}:{nonce}:{fields.get('nc')}:{fields.get('cnonce')}:auth:{ha2}")
+            if fields.get("username") != self.username or fields.get("response") != expected:
+                return False
+            self.nonces[nonce] = (issued_at, nc)
+        return None
+
+    # ---- LAPI ----
+
+    def route(self, method, path, body):
+        """Returns (status, json body)."""
+        url = path
+        path = path.split("?")[0]
+        if path.startswith("/LAPI/V1.0/"):
+            path = path[len("/LAPI/V1.0/"):]
+
+        with self.lock:
+            if path == "System/DeviceInfo" and method == "GET":
+                return 200, lapi_response(url, {"DeviceModel": "MOCK-NVR", "SerialNumber": f"MOCK{self.port}",
+                                                "FirmwareVersion": "mock"})
+
+            if path == "System/Event/Subscription" and method == "POST":
+                sub_id = self.next_sub
+                self.next_sub += 1
+                duration = int((body or {}).get("Duration", 3000))
+                self.subscriptions[sub_id] = time.time() + duration
+                return 200, lapi_response(url, {"ID": sub_id, "Reference": f"mock/Subscribers/{sub_id}",
+                                                "CurrentTime": int(time.time()),
+                                                "TerminationTime": int(self.subscriptions[sub_id])})
+
+            m = re.fullmatch(r"System/Event/Subscription/(\d+)", path)
+            if m and method == "PUT":
+                sub_id = int(m.group(1))
+                if sub_id not in self.subscriptions:
+                    return 200, lapi_response(url, code=4)
+                duration = int((body or {}).get("Duration", 3000))
+                self.subscriptions[sub_id] = time.time() + duration
+                return 200, lapi_response(url, {"ID": sub_id, "CurrentTime": int(time.time()),
+                                                "TerminationTime": int(self.subscriptions[sub_id])})
+
+            m = re.fullmatch(r"PeopleLibraries/(\d+)/People/Info", path)
+            if m and method == "POST":
+                people = sorted(self.people.get(int(m.group(1)), {}).values(), key=lambda p: p["PersonID"])
+                offset = int((body or {}).get("Offset", 0))
+                page = people[offset:offset + int((body or {}).get("Limit", 100))]
+                return 200, lapi_response(url, {"Total": len(people), "Offset": offset, "Num": len(page),
+                                                "PersonInfoList": page})
+
+            m = re.fullmatch(r"PeopleLibraries/(\d+)/People/(\d+)", path)
+            if m and method in ("PUT", "DELETE"):
+                lib = self.people.setdefault(int(m.group(1)), {})
+                pid = int(m.group(2))
+                if pid not in lib:
+                    return 200, lapi_response(url, code=4)
+                if method == "DELETE":
+                    del lib[pid]
+                else:
+                    p = dict(body or {}, PersonID=pid)
+                    p["ImageList"] = [{k: v for k, v in img.items() if k != "Data"} for img in p.get("ImageList", [])]
+                    lib[pid] = p
+                return 200, lapi_response(url)
+
+            m = re.fullmatch(r"PeopleLibraries/(\d+)/People", path)
+            if m and method == "POST":
+                if self.max_batch and len((body or {}).get("PersonInfoList", [])) > self.max_batch:
+                    return 599, lapi_response(url, code=3)
+                lib = self.people.setdefault(int(m.group(1)), {})
+                results = []
+                for p in (body or {}).get("PersonInfoList", []):
+                    # keep metadata only; image bytes would make the mock grow with the library
+                    p["ImageList"] = [{k: v for k, v in img.items() if k != "Data"} for img in p.get("ImageList", [])]
+                    lib[p["PersonID"]] = p
+                    results.append({"PersonID": p["PersonID"], "FaceID": p["PersonID"], "ResultCode": 0})
+                return 200, lapi_response(url, {"Num": len(results), "PersonList": results})
+
+        return 200, lapi_response(url, code=1)
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = 64 * 1024
+
+            def log_message(self, fmt, *args):
+                return
+
+            def setup(self):
+                super().setup()
+                with mock.lock:
+                    mock.counters["connections"] += 1
+
+            def _reply(self, status, obj, extra_headers=()):
+                raw = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for k, v in extra_headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length", "0") or "0")
+                raw = self.rfile.read(length) if length else b""
+                with mock.lock:
+                    mock.counters["requests"] += 1
+                if mock.delay:
+                    time.sleep(mock.delay)
+
+                stale = mock._check_auth(self.command, self.headers.get("Authorization"))
+                if stale is not None:
+                    with mock.lock:
+                        mock.counters["challenges"] += 1
+                        nonce = mock._new_nonce()
+                    challenge = (f'Digest realm="{REALM}", qop="auth", nonce="{nonce}", '
+                                 f'opaque="", stale={"true" if stale else "false"}')
+                    self._reply(401, {"error": "unauthorized"}, [("WWW-Authenticate", challenge)])
+                    return
+
+                with mock.lock:
+                    failing = mock.fail_next > 0
+                    if failing:
+                        mock.fail_next -= 1
+                if failing:
+                    self._reply(500, {"error": "injected failure"})
+                    return
+
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    body = None
+                status, obj = mock.route(self.command, self.path, body)
+                self._reply(status, obj)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
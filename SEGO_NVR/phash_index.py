@@ -0,0 +1,154 @@
+"""
+Perceptual-hash index for spotting the same face photo under different names.
+
+Each image gets a 64-bit dHash (9x8 greyscale, one bit per horizontal
+gradient), which survives re-encoding, resizing and small crops. Lookups use
+multi-index hashing: the 64 bits are cut into four 16-bit chunks, and any hash
+within Hamming distance `radius` must be within radius // 4 of the query in at
+least one chunk (pigeonhole). A query probes those few chunk values in each
+table and only checks the handful of entries found there.
+
+Entries are appended to a JSONL file keyed by content sha256, so an image is
+only decoded once across runs. Needs Pillow to hash new images.
+
+    index = PhashIndex("blobs/phash.jsonl", radius=6)
+    dup = index.check_file("patron_0042", path, sha256)   # None or the earlier key
+"""
+import hashlib
+import io
+import json
+import os
+import itertools
+import threading
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+RADIUS = 6      # max differing bits for "same photo"; unrelated photos differ in ~32 of 64
+CHUNKS = 4      # 16-bit chunks: ~1.5 entries per bucket at 100k images
+
+
+def dhash(im):
+    im.draft("L", (144, 128))  # JPEGs decode at 1/2..1/8 scale; only 9x8 pixels are needed
+    px = im.convert("L").resize((9, 8), Image.BOX).tobytes()
+    h = 0
+    for row in range(8):
+        for col in range(8):
+            h = (h << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return h
+
+
+def dhash_bytes(raw):
+    with Image.open(io.BytesIO(raw)) as im:
+        return dhash(im)
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class PhashIndex:
+    def __init__(self, path=None, radius=RADIUS):
+        self.path = path
+        self.radius = radius
+        self.lock = threading.Lock()
+
+        bits = 64 // CHUNKS
+        self.chunks = [(i * bits, (1 << bits) - 1) for i in range(CHUNKS)]   # (shift, mask)
+        self.tables = [{} for _ in self.chunks]   # chunk value -> [entry ids]
+        # every chunk value within radius // CHUNKS bits of a query chunk, as xor masks
+        self.probes = [0] + [sum(1 << b for b in flips)
+                             for k in range(1, radius // CHUNKS + 1)
+                             for flips in itertools.combinations(range(bits), k)]
+
+        self.hashes = []        # entry id -> hash
+        self.keys = []          # entry id -> key
+        self.by_sha = {}        # sha256 -> hash, so known content is never decoded again
+        self.links = {}         # key -> (earlier key it duplicates, sha256 of its image)
+
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line
+                    h = int(rec["Hash"], 16)
+                    self.by_sha[rec["SHA256"]] = h
+                    if rec.get("DuplicateOf"):
+                        self.links[rec["Key"]] = (rec["DuplicateOf"], rec["SHA256"])
+                    else:
+                        self._insert(h, rec["Key"])
+        self.f = open(path, "a", encoding="utf-8") if path else None
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def _insert(self, h, key):
+        eid = len(self.hashes)
+        self.hashes.append(h)
+        self.keys.append(key)
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            table.setdefault((h >> shift) & mask, []).append(eid)
+
+    def query(self, h, radius=None):
+        """[(distance, key)] for every entry within radius (<= the index radius), nearest first."""
+        radius = self.radius if radius is None else min(radius, self.radius)
+        seen = set()
+        found = []
+        for table, (shift, mask) in zip(self.tables, self.chunks):
+            c = (h >> shift) & mask
+            for probe in self.probes:
+                for eid in table.get(c ^ probe, ()):
+                    if eid in seen:
+                        continue
+                    seen.add(eid)
+                    d = hamming(h, self.hashes[eid])
+                    if d <= radius:
+                        found.append((d, self.keys[eid]))
+        found.sort()
+        return found
+
+    def check(self, key, h, sha256):
+        """
+        Returns the key this image near-duplicates (a different key already in
+        the index), else adds it under `key` and returns None.
+        """
+        with self.lock:
+            link = self.links.get(key)
+            if link is not None and link[1] == sha256:
+                return link[0]
+            matches = self.query(h)
+            if any(k == key for _, k in matches):
+                return None
+            dup = matches[0][1] if matches else None
+            if dup is not None:
+                self.links[key] = (dup, sha256)
+            else:
+                self._insert(h, key)
+            self.by_sha[sha256] = h
+            if self.f is not None:
+                rec = {"Key": key, "SHA256": sha256, "Hash": f"{h:016x}", "DuplicateOf": dup}
+                self.f.write(json.dumps(rec) + "\n")
+                self.f.flush()
+            return dup
+
+    def check_bytes(self, key, raw, sha256=None):
+        sha256 = sha256 or hashlib.sha256(raw).hexdigest()
+        h = self.by_sha.get(sha256)
+        if h is None:
+            h = dhash_bytes(raw)
+        return self.check(key, h, sha256)
+
+    def check_file(self, key, path, sha256):
+        h = self.by_sha.get(sha256)
+        if h is None:
+            with Image.open(path) as im:
+                h = dhash(im)
+        return self.check(key, h, sha256)
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
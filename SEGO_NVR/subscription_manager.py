@@ -0,0 +1,224 @@
+"""
+Keeps event subscriptions alive on any number of NVRs from one thread.
+
+Each subscription's next renewal sits in a min-heap, due at renew_fraction of
+its Duration. The scheduler sleeps until the earliest entry, then services
+every subscription due within batch_window_s in one concurrent batch (via
+AsyncUNVClient). A failed renew falls back to a fresh subscribe; failed
+subscribes retry with jittered exponential backoff.
+
+    manager = SubscriptionManager("192.168.1.50", 9000, on_change=print)
+    manager.add("192.168.1.105", "admin", "P@ssword123")
+    manager.start()
+    manager.state()
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from unv_client import AsyncUNVClient
+
+
+class Subscription:
+    def __init__(self, nvr_ip, client):
+        self.nvr_ip = nvr_ip
+        self.client = client
+        self.sub_id = None
+        self.status = "pending"
+        self.expires_at = None
+        self.next_action_at = None
+        self.failures = 0
+        self.last_error = None
+        self.generation = 0
+
+    def snapshot(self):
+        return {
+            "nvr_ip": self.nvr_ip,
+            "sub_id": self.sub_id,
+            "status": self.status,
+            "expires_at": self.expires_at,
+            "next_action_at": self.next_action_at,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class SubscriptionManager:
+    def __init__(self, callback_ip, callback_port, duration_s=3000, renew_fraction=0.8,
+                 batch_window_s=5.0, backoff_base_s=5.0, backoff_max_s=300.0, timeout=10, on_change=None):
+        self.callback_ip = callback_ip
+        self.callback_port = callback_port
+        self.duration_s = duration_s
+        self.renew_fraction = renew_fraction
+        self.batch_window_s = batch_window_s
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.timeout = timeout
+        self.on_change = on_change
+
+        self.subs = {}
+        self.heap = []          # (due, seq, nvr_ip, generation)
+        self.seq = itertools.count()
+        self.lock = threading.Lock()
+        self.loop = None
+        self.wakeup = None
+        self.stopping = False
+        self.thread = None
+
+    # ---- public, thread-safe ----
+
+    def add(self, nvr_ip, username, password, **client_kwargs):
+        client = AsyncUNVClient(nvr_ip, username, password, timeout=self.timeout, **client_kwargs)
+        with self.lock:
+            old = self.subs.get(nvr_ip)
+            if old is not None:
+                old.client.close()
+            sub = Subscription(nvr_ip, client)
+            self.subs[nvr_ip] = sub
+            self._schedule(sub, time.time())
+        self._wake()
+
+    def remove(self, nvr_ip):
+        with self.lock:
+            sub = self.subs.pop(nvr_ip, None)
+            if sub is not None:
+                sub.generation += 1
+        if sub is not None:
+            sub.client.close()
+
+    def resubscribe(self, nvr_ip):
+        """Drop the current subscription ID and subscribe again right away."""
+        with self.lock:
+            sub = self.subs.get(nvr_ip)
+            if sub is None:
+                return
+            sub.sub_id = None
+            self._schedule(sub, time.time())
+        self._wake()
+
+    def state(self):
+        with self.lock:
+            return [s.snapshot() for s in self.subs.values()]
+
+    def start(self):
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.run()),
+                                       name="subscription-manager", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping = True
+        self._wake()
+        if self.thread is not None:
+            self.thread.join(self.timeout + 1)
+
+    # ---- scheduler ----
+
+    def _schedule(self, sub, due):
+        """Called with the lock held."""
+        sub.generation += 1
+        sub.next_action_at = due
+        heapq.heappush(self.heap, (due, next(self.seq), sub.nvr_ip, sub.generation))
+
+    def _wake(self):
+        loop, wakeup = self.loop, self.wakeup
+        if loop is not None and wakeup is not None:
+            loop.call_soon_threadsafe(wakeup.set)
+
+    def _take_due(self):
+        """Pops every live entry due within the batch window of now, as (sub, generation)."""
+        batch = []
+        with self.lock:
+            horizon = time.time() + self.batch_window_s
+            while self.heap and self.heap[0][0] <= horizon:
+                due, _, nvr_ip, generation = heapq.heappop(self.heap)
+                sub = self.subs.get(nvr_ip)
+                if sub is not None and sub.generation == generation:
+                    batch.append((sub, generation))
+            next_due = self.heap[0][0] if self.heap else None
+        return batch, next_due
+
+    async def run(self):
+        # the Event must exist before _wake() can see the loop
+        self.wakeup = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        while not self.stopping:
+            batch, next_due = self._take_due()
+            if batch:
+                await asyncio.gather(*(self._service(sub, generation) for sub, generation in batch))
+                continue
+
+            self.wakeup.clear()
+            timeout = None if next_due is None else max(0.0, next_due - self.batch_window_s - time.time())
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _service(self, sub, generation):
+        """
+        Renews or subscribes. The outcome is only applied if nothing rescheduled
+        sub meanwhile; a resubscribe() or remove() during the call wins.
+        """
+        try:
+            sub_id = sub.sub_id
+            if sub_id is not None:
+                resp = await sub.client.renew_subscription(sub_id, duration_s=self.duration_s)
+                if _response_code(resp) == 0:
+                    self._succeeded(sub, generation, sub_id, "active")
+                    return
+                # renew refused (subscription expired on the NVR); subscribe afresh
+                with self.lock:
+                    if sub.generation == generation:
+                        sub.sub_id = None
+
+            resp = await sub.client.subscribe(self.callback_ip, self.callback_port, duration_s=self.duration_s)
+            if _response_code(resp) != 0:
+                raise RuntimeError(f"subscribe failed: {resp.get('Response', {}).get('ResponseString')}")
+            self._succeeded(sub, generation, resp["Response"]["Data"]["ID"], "active")
+        except Exception as e:
+            self._failed(sub, generation, e)
+
+    def _succeeded(self, sub, generation, sub_id, status):
+        now = time.time()
+        with self.lock:
+            if sub.generation != generation:
+                return
+            sub.sub_id = sub_id
+            sub.status = status
+            sub.failures = 0
+            sub.last_error = None
+            sub.expires_at = now + self.duration_s
+            self._schedule(sub, now + self.duration_s * self.renew_fraction)
+        self._notify(sub)
+
+    def _failed(self, sub, generation, error):
+        now = time.time()
+        with self.lock:
+            if sub.generation != generation:
+                return
+            sub.failures += 1
+            sub.last_error = str(error)
+            if sub.expires_at is None:
+                sub.status = "failed"
+            else:
+                sub.status = "expired" if now >= sub.expires_at else "retrying"
+            cap = min(self.backoff_max_s, self.backoff_base_s * 2 ** (sub.failures - 1))
+            delay = cap / 2 + random.uniform(0, cap / 2)
+            self._schedule(sub, now + delay)
+        self._notify(sub)
+
+    def _notify(self, sub):
+        if self.on_change is not None:
+            try:
+                self.on_change(sub.snapshot())
+            except Exception as e:
+                print("on_change error:", e)
+
+
+def _response_code(resp):
+    if not isinstance(resp, dict):
+        return None
+    return resp.get("Response", {}).get("ResponseCode")
@@ -0,0 +1,190 @@
+"""
+Small face thumbnails for match displays, decoded once and cached.
+
+A PersonInfo carries a ~600 KB capture crop and the library photo for every
+match (on disk as DataFile once the receiver spills them, or inline base64).
+request() decodes them on a worker thread into PNG thumbnails (Tk's
+PhotoImage reads PNG directly), keyed by image content (DataSHA256, or a hash
+of the inline base64): RelatedIDs are per-NVR counters, and a re-enrolled
+photo keeps its PersonID/FaceID. Results are kept in a byte-bounded
+in-memory LRU and in disk_dir, which is bounded too (oldest used files go
+first), so later views and restarts skip the decode.
+
+Needs Pillow to make new thumbnails; without it lookups simply miss.
+
+    thumbs = ThumbnailCache("thumbs", size=96)
+    for key, source in face_sources(face):        # a FaceInfoList entry
+        thumbs.request(key, source)
+    png = thumbs.get(key)                          # None until decoded
+"""
+import base64
+import hashlib
+import io
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+THUMB_SIZE = 96
+MEMORY_BYTES = 8 * 1024 * 1024
+DISK_BYTES = 64 * 1024 * 1024
+
+
+def image_source(image):
+    """(key, DataFile path or base64 Data) for one image node, or None. The key is the image's content hash."""
+    if image.get("DataFile"):
+        return image.get("DataSHA256") or os.path.basename(image["DataFile"]).split(".")[0], image["DataFile"]
+    if image.get("Data"):
+        return "b64-" + hashlib.sha256(image["Data"].encode("ascii", "replace")).hexdigest(), image["Data"]
+    return None
+
+
+def face_sources(face):
+    """[(key, DataFile path or base64 Data)] for the capture and library images of one FaceInfoList entry."""
+    compare = face.get("CompareInfo", {})
+    snap = compare.get("SnapshotImage", {})
+    images = [snap.get("SmallImage") or snap.get("BigImage") or {}]
+    images += compare.get("PersonInfo", {}).get("ImageList", [])
+    return [src for src in map(image_source, images) if src is not None]
+
+
+class ThumbnailCache:
+    def __init__(self, disk_dir, size=THUMB_SIZE, memory_bytes=MEMORY_BYTES, workers=2, disk_bytes=DISK_BYTES):
+        self.disk_dir = disk_dir
+        self.size = size
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        os.makedirs(disk_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.lru = OrderedDict()        # key -> PNG bytes, most recent last
+        self.used = 0
+        self.disk = OrderedDict()       # path -> size of thumbnails on disk, least recently used first
+        self.disk_used = 0
+        files = [e for e in os.scandir(disk_dir) if e.is_file() and e.name.endswith(".png")]
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            self.disk[entry.path] = entry.stat().st_size
+            self.disk_used += entry.stat().st_size
+        self.inflight = {}              # key -> [callbacks]
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="thumb")
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "decoded": 0, "errors": 0}
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", key) + f"_{self.size}.png")
+
+    def _remember(self, key, png):
+        """Called with the lock held."""
+        old = self.lru.pop(key, None)
+        if old is not None:
+            self.used -= len(old)
+        self.lru[key] = png
+        self.used += len(png)
+        while self.used > self.memory_bytes and len(self.lru) > 1:
+            _, evicted = self.lru.popitem(last=False)
+            self.used -= len(evicted)
+
+    def _touch_disk(self, path, size):
+        """Records path as just used; returns files to delete to stay within disk_bytes. Lock held."""
+        old = self.disk.pop(path, None)
+        if old is not None:
+            self.disk_used -= old
+        self.disk[path] = size
+        self.disk_used += size
+        evict = []
+        while self.disk_used > self.disk_bytes and len(self.disk) > 1:
+            victim, victim_size = self.disk.popitem(last=False)
+            self.disk_used -= victim_size
+            evict.append(victim)
+        return evict
+
+    def get(self, key):
+        """Thumbnail from memory only (never blocks on disk or decoding), else None."""
+        with self.lock:
+            png = self.lru.get(key)
+            if png is not None:
+                self.lru.move_to_end(key)
+                self.counters["memory_hits"] += 1
+            return png
+
+    def request(self, key, source, callback=None):
+        """Starts loading key from disk or source in the background; callback(key, png or None) on a worker."""
+        png = self.get(key)
+        if png is not None:
+            if callback:
+                callback(key, png)
+            return
+        with self.lock:
+            waiting = self.inflight.get(key)
+            if waiting is not None:
+                if callback:
+                    waiting.append(callback)
+                return
+            self.inflight[key] = [callback] if callback else []
+        self.pool.submit(self._load, key, source)
+
+    def _load(self, key, source):
+        png = None
+        evict = []
+        try:
+            path = self._disk_path(key)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    png = f.read()
+                os.utime(path)
+                self.counters["disk_hits"] += 1
+            elif Image is not None:
+                png = self._make(source)
+                tmp = path + ".part"
+                with open(tmp, "wb") as f:
+                    f.write(png)
+                os.replace(tmp, path)
+                self.counters["decoded"] += 1
+            if png is not None:
+                with self.lock:
+                    evict = self._touch_disk(path, len(png))
+        except Exception as e:
+            self.counters["errors"] += 1
+            print(f"thumbnail {key}: {e}")
+            png = None
+        for victim in evict:
+            try:
+                os.remove(victim)
+            except OSError:
+                pass
+
+        with self.lock:
+            if png is not None:
+                self._remember(key, png)
+            callbacks = self.inflight.pop(key, [])
+        for cb in callbacks:
+            try:
+                cb(key, png)
+            except Exception as e:
+                print("thumbnail callback error:", e)
+
+    def _make(self, source):
+        if isinstance(source, str) and os.path.exists(source):
+            im = Image.open(source)
+        else:
+            im = Image.open(io.BytesIO(base64.b64decode(source)))
+        with im:
+            im.draft("RGB", (self.size * 2, self.size * 2))   # JPEG: decode at reduced scale
+            im = im.convert("RGB")
+            im.thumbnail((self.size, self.size), Image.BILINEAR)
+            buf = io.BytesIO()
+            im.save(buf, "PNG", optimize=True)
+            return buf.getvalue()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, entries=len(self.lru), memory_bytes=self.used,
+                        disk_entries=len(self.disk), disk_bytes=self.disk_used)
+
+    def close(self):
+        self.pool.shutdown(wait=False)
@@ -1,5 +1,9 @@
+import asyncio
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPDigestAuth
 
 nvr_ip = "192.168.1.105"
@@ -10,47 +14,157 @@ client_port = 9000
 
 
 class UNVClient:
-    def __init__(self, nvr_ip, username: str, password: str, scheme: str = "http"):
+    def __init__(self, nvr_ip, username: str, password: str, scheme: str = "http",
+                 pool_size: int = 4, verbose: bool = True):
         self.nvr_ip = nvr_ip
         self.username = username
         self.password = password
         self.base = f"{scheme}://{nvr_ip}/LAPI/V1.0/"
+        self.verbose = verbose
+
+        # One keep-alive session per NVR. The digest auth object lives as long as
+        # the session, so after the first 401 challenge every request carries a
+        # pre-computed Authorization header (same nonce, nc incremented per call)
+        # and the NVR only re-challenges when it marks the nonce stale.
+        self.http = requests.Session()
+        self.http.auth = HTTPDigestAuth(username, password)
+        self.http.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
 
     def sendrq(self, endpoint: str, method, payload, timeout: int = 10):
         url = self.base + endpoint
-        r = requests.request(method.upper(),
+        r = self.http.request(method.upper(),
             url,
             json=payload,
-            auth=HTTPDigestAuth(self.username, self.password),
-            headers={"Content-Type": "application/json"},
             timeout=timeout,)
-        print("Status:", r.status_code)
-        print(r.text)
+        if self.verbose:
+            print("Status:", r.status_code)
+            print(r.text)
         return r.json()
 
+    def close(self):
+        self.http.close()
+
 
     def subscribe(self, client_ip, client_port, duration_s: int = 3000):
         endpoint = "System/Event/Subscription"
         payload = {
-            "AddressType": 0,          
+            "AddressType": 0,
             "IPAddress": client_ip,
             "Port": client_port,
             "Duration": duration_s
         }
         method = "POST"
         return self.sendrq(endpoint, method, payload)
-    
+
     def renew_subscription(self, sub_id: int, duration_s: int = 3000):
         endpoint = f"System/Event/Subscription/{sub_id}"
         payload = {"Duration": int(duration_s)}
         return self.sendrq(endpoint, method="PUT", payload=payload)
-    
+
 
     def get_device_info(self):
         endpoint = "System/DeviceInfo"
         return self.sendrq(endpoint, payload="", method="GET")
 
 
-client = UNVClient(nvr_ip, username, password)
-client.subscribe(client_ip,client_port)
-client.get_device_info()
\ No newline at end of file
+class AsyncUNVClient:
+    """
+    asyncio counterpart of UNVClient with the same methods, for driving many NVRs at once.
+
+    Each call runs the pooled UNVClient session on a shared thread pool, capped
+    per host by a semaphore and bounded by a per-call timeout, so one slow or
+    dead NVR only ties up its own slots. A call that times out keeps its slot
+    until the worker thread actually returns, so a hung NVR can't pile up
+    more than max_per_host threads in the shared pool.
+    """
+
+    executor = None
+
+    def __init__(self, nvr_ip, username: str, password: str, scheme: str = "http",
+                 max_per_host: int = 2, timeout: float = 10, verbose: bool = False):
+        self.nvr_ip = nvr_ip
+        self.timeout = timeout
+        self.sync = UNVClient(nvr_ip, username, password, scheme=scheme,
+                              pool_size=max_per_host, verbose=verbose)
+        self.limit = asyncio.Semaphore(max_per_host)
+
+    @classmethod
+    def set_pool_size(cls, workers: int):
+        """Threads shared by every AsyncUNVClient; size it to the fleet, not the CPU."""
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=False)
+        cls.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lapi")
+
+    async def sendrq(self, endpoint: str, method, payload, timeout: float = None):
+        timeout = self.timeout if timeout is None else timeout
+        if AsyncUNVClient.executor is None:
+            AsyncUNVClient.set_pool_size(64)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # waiting for a slot counts against the same timeout as the call
+        await asyncio.wait_for(self.limit.acquire(), timeout)
+        try:
+            work = AsyncUNVClient.executor.submit(self.sync.sendrq, endpoint, method, payload, timeout=timeout)
+        except BaseException:
+            self.limit.release()
+            raise
+        # released when the thread is done, not when we stop waiting for it
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self.limit.release)
+            except RuntimeError:
+                pass    # the loop has closed, and nothing is left waiting for a slot
+        work.add_done_callback(release)
+        return await asyncio.wait_for(asyncio.wrap_future(work, loop=loop), max(0.0, deadline - loop.time()))
+
+    async def subscribe(self, client_ip, client_port, duration_s: int = 3000):
+        payload = {
+            "AddressType": 0,
+            "IPAddress": client_ip,
+            "Port": client_port,
+            "Duration": duration_s
+        }
+        return await self.sendrq("System/Event/Subscription", "POST", payload)
+
+    async def renew_subscription(self, sub_id: int, duration_s: int = 3000):
+        payload = {"Duration": int(duration_s)}
+        return await self.sendrq(f"System/Event/Subscription/{sub_id}", "PUT", payload)
+
+    async def get_device_info(self):
+        return await self.sendrq("System/DeviceInfo", "GET", "")
+
+    def close(self):
+        self.sync.close()
+
+
+async def fleet_call(calls):
+    """
+    Run {nvr_ip: coroutine} concurrently. Returns {nvr_ip: result or exception};
+    a failing NVR never cancels or delays the others beyond its own timeout.
+    """
+    keys = list(calls)
+    results = await asyncio.gather(*(calls[k] for k in keys), return_exceptions=True)
+    return dict(zip(keys, results))
+
+
+async def fetch_device_info_all(clients):
+    return await fleet_call({c.nvr_ip: c.get_device_info() for c in clients})
+
+
+async def subscribe_all(clients, client_ip, client_port, duration_s: int = 3000):
+    return await fleet_call({c.nvr_ip: c.subscribe(client_ip, client_port, duration_s) for c in clients})
+
+
+async def renew_all(subscriptions, duration_s: int = 3000):
+    """subscriptions: {AsyncUNVClient: sub_id}"""
+    return await fleet_call({c.nvr_ip: c.renew_subscription(sub_id, duration_s)
+                             for c, sub_id in subscriptions.items()})
+
+
+if __name__ == "__main__":
+    client = UNVClient(nvr_ip, username, password)
+    client.subscribe(client_ip,client_port)
+    client.get_device_info()
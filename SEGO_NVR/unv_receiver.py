@@ -1,25 +1,235 @@
+import asyncio
+import inspect
 import json
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-def run_receiver(listen_host, listen_port, on_event):
+from blob_store import BlobStore
+from unv_stream import CHUNK_SIZE, StreamingPayloadParser, parse_stream
+
+# asyncio receiver limits
+MAX_CONNECTIONS = 4096
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 32 * 1024 * 1024
+MAX_BUFFERED_BYTES = 256 * 1024 * 1024  # bodies held in memory at once without spill_dir; past it, 503
+IDLE_TIMEOUT = 120                      # waiting for a request head
+BODY_TIMEOUT = 30                       # waiting for the next piece of a body
+
+ACK_KEEPALIVE = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\nOK"
+ACK_CLOSE = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: close\r\n\r\nOK"
+# the body can't be skipped after these, so the connection is closed
+BAD_REQUEST = b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+NOT_IMPLEMENTED = b"HTTP/1.1 501 Not Implemented\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+BUSY = b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+class RejectRequest(Exception):
+    """Raised while reading a request head; response is sent before closing."""
+
+    def __init__(self, response):
+        super().__init__(response.split(b"\r\n", 1)[0].decode("latin-1"))
+        self.response = response
+
+
+def content_length(value):
+    """Content-Length header value as an int, or None if it isn't a valid length."""
+    try:
+        length = int(value or "0")
+    except ValueError:
+        return None
+    return length if length >= 0 else None
+
+
+def parse_payload(raw):
+    try:
+        return json.loads(raw.decode("utf-8", errors="replace"))
+    except Exception:
+        return None
+
+
+def run_receiver(listen_host, listen_port, on_event, mode="thread", spill_dir=None):
+    """spill_dir: stream bodies and write inline base64 images to a BlobStore there instead of into the payload."""
+    if mode == "asyncio":
+        asyncio.run(serve_async(listen_host, listen_port, on_event, spill_dir=spill_dir))
+        return
+
+    store = BlobStore(spill_dir) if spill_dir is not None else None
+
     class Handler(BaseHTTPRequestHandler):
+        timeout = IDLE_TIMEOUT      # socket timeout, so a stalled sender doesn't hold its thread forever
+
         def log_message(self, fmt, *args):
             return
 
         def do_POST(self):
-            length = int(self.headers.get("Content-Length", "0") or "0")
-            raw = self.rfile.read(length) if length else b""
+            # NVRs send Content-Length; chunked bodies are refused rather than read as empty
+            if self.headers.get("Transfer-Encoding"):
+                self.send_error(501, "Transfer-Encoding not supported")
+                return
+            length = content_length(self.headers.get("Content-Length"))
+            if length is None:
+                self.send_error(400, "bad Content-Length")
+                return
+            if store is not None:
+                payload = parse_stream(self.rfile.read, length, store) if length else None
+            else:
+                raw = self.rfile.read(length) if length else b""
+                payload = parse_payload(raw)
 
             self.send_response(200)
             self.end_headers()
             self.wfile.write(b"OK")
 
-            try:
-                payload = json.loads(raw.decode("utf-8", errors="replace"))
-            except Exception:
+            if payload is None:
                 return
 
             on_event(self.path, payload)
 
     httpd = ThreadingHTTPServer((listen_host, listen_port), Handler)
-    httpd.serve_forever()
\ No newline at end of file
+    httpd.serve_forever()
+
+
+async def serve_async(listen_host, listen_port, on_event, ready=None, spill_dir=None):
+    """
+    Single-threaded keep-alive receiver. on_event may be a plain function or a
+    coroutine function; a plain one runs on a worker thread so a slow callback
+    doesn't stall every other connection.
+
+    Memory stays bounded: with spill_dir a body is parsed chunk by chunk;
+    without it, bodies held at once are capped at MAX_BUFFERED_BYTES and a
+    request past that gets 503 (the NVR retries). A sender that stops for
+    BODY_TIMEOUT mid-body is disconnected.
+    """
+    is_async = inspect.iscoroutinefunction(on_event)
+    store = BlobStore(spill_dir) if spill_dir is not None else None
+    active = 0
+    buffered = 0
+
+    async def handle(reader, writer):
+        nonlocal active, buffered
+        if active >= MAX_CONNECTIONS:
+            writer.close()
+            return
+        active += 1
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except RejectRequest as e:
+                    writer.write(e.response)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, length, keep_alive = request
+
+                if store is not None:
+                    payload = await _read_streaming(reader, length, store)
+                elif buffered + length > MAX_BUFFERED_BYTES:
+                    writer.write(BUSY)
+                    await writer.drain()
+                    break
+                else:
+                    buffered += length
+                    try:
+                        payload = parse_payload(await _read_body(reader, length))
+                    finally:
+                        buffered -= length
+
+                writer.write(ACK_KEEPALIVE if keep_alive else ACK_CLOSE)
+                await writer.drain()
+
+                # only POST notifications are handed on; other methods still get an ack
+                if method == "POST" and payload is not None:
+                    try:
+                        if is_async:
+                            await on_event(path, payload)
+                        else:
+                            await asyncio.to_thread(on_event, path, payload)
+                    except Exception as e:
+                        print("on_event error:", e)
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            active -= 1
+            writer.close()
+
+    server = await asyncio.start_server(handle, listen_host, listen_port,
+                                        limit=MAX_HEADER_BYTES, backlog=1024)
+    if ready is not None:
+        ready(server)
+    async with server:
+        await server.serve_forever()
+
+
+async def _read_request(reader):
+    """
+    Reads the request head. Returns (method, path, length, keep_alive), or None
+    to close. Raises RejectRequest for a bad Content-Length or a chunked body.
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+    except asyncio.LimitOverrunError:
+        return None
+    except asyncio.IncompleteReadError:
+        return None
+
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3:
+        return None
+    method, path, version = parts
+
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+
+    conn = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        keep_alive = conn == "keep-alive"
+    else:
+        keep_alive = conn != "close"
+
+    if "transfer-encoding" in headers:
+        raise RejectRequest(NOT_IMPLEMENTED)
+    length = content_length(headers.get("content-length"))
+    if length is None:
+        raise RejectRequest(BAD_REQUEST)
+    if length > MAX_BODY_BYTES:
+        return None
+    return method, path, length, keep_alive
+
+
+async def _read_chunk(reader, remaining):
+    """Up to CHUNK_SIZE of the body; raises TimeoutError if the sender stalls, IncompleteReadError at EOF."""
+    chunk = await asyncio.wait_for(reader.read(min(CHUNK_SIZE, remaining)), BODY_TIMEOUT)
+    if not chunk:
+        raise asyncio.IncompleteReadError(b"", remaining)
+    return chunk
+
+
+async def _read_body(reader, length):
+    body = bytearray()
+    while len(body) < length:
+        body += await _read_chunk(reader, length - len(body))
+    return bytes(body)
+
+
+async def _read_streaming(reader, length, store):
+    if not length:
+        return None
+    parser = StreamingPayloadParser(store)
+    remaining = length
+    try:
+        while remaining > 0:
+            chunk = await _read_chunk(reader, remaining)
+            parser.feed(chunk)
+            remaining -= len(chunk)
+    except BaseException:
+        parser.abort()
+        raise
+    return parser.close()
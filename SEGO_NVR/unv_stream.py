@@ -0,0 +1,230 @@
+"""
+Incremental parser for UNV notification bodies.
+
+PersonInfo callbacks carry every face image inline as a base64 "Data" string
+(~1.4 MB per event). StreamingPayloadParser is fed the body chunk by chunk:
+everything except the "Data" strings is kept as a small JSON skeleton, and each
+"Data" string is base64-decoded straight into a BlobStore as it arrives. The
+parsed payload has "Data" replaced with "DataFile" (path to the image on disk)
+and "DataSHA256", so on_event never sees the megabyte-scale strings.
+
+A "Data" string that can't be decoded or stored (truncated, or redacted like
+some of the captures in unv_events/) only loses that image: its temp file is
+removed and the node gets "DataError" (the reason) instead of "Data", while
+the rest of the payload (names, similarity, ...) is still delivered, as the
+plain json.loads path would.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import os
+
+CHUNK_SIZE = 64 * 1024
+BLOB_KEYS = (b"Data",)
+WHITESPACE = b" \t\r\n"
+PLACEHOLDER = "@blob:"
+
+
+class BlobWriter:
+    """Decodes a base64 stream into a store temp file, then adopts it under its sha256."""
+
+    def __init__(self, store):
+        self.store = store
+        self.f, self.tmp_path = store.temp_file()
+        self.sha = hashlib.sha256()
+        self.pending = b""
+        self.size = 0
+        self.error = None
+
+    def write(self, data):
+        if self.error is not None:
+            return
+        try:
+            self._write(data)
+        except (binascii.Error, ValueError, OSError) as e:
+            self.error = str(e) or type(e).__name__
+            self.abort()
+
+    def _write(self, data):
+        data = self.pending + data
+        # a JSON escape ("\/") may be split across chunks
+        if data.endswith(b"\\"):
+            data, self.pending = data[:-1], b"\\"
+        else:
+            self.pending = b""
+        data = data.replace(b"\\/", b"/").replace(b"\\n", b"").replace(b"\\r", b"")
+
+        usable = len(data) - len(data) % 4
+        if usable:
+            self._emit(base64.b64decode(data[:usable]))
+        self.pending = data[usable:] + self.pending
+
+    def _emit(self, raw):
+        self.f.write(raw)
+        self.sha.update(raw)
+        self.size += len(raw)
+
+    def finish(self):
+        """Returns (path, sha256, size); path is None for an empty string or on error (see .error)."""
+        if self.error is None:
+            try:
+                tail = self.pending.replace(b"\\", b"")
+                if tail:
+                    tail += b"=" * (-len(tail) % 4)
+                    self._emit(base64.b64decode(tail))
+                self.f.close()
+            except (binascii.Error, ValueError, OSError) as e:
+                self.error = str(e) or type(e).__name__
+                self.abort()
+        if self.error is not None:
+            return None, None, 0
+
+        if self.size == 0:
+            os.remove(self.tmp_path)
+            return None, None, 0
+
+        digest = self.sha.hexdigest()
+        final = self.store.adopt(self.tmp_path, digest, self.size)
+        return str(final), digest, self.size
+
+    def abort(self):
+        self.f.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class StreamingPayloadParser:
+    def __init__(self, store):
+        self.store = store
+        self.skeleton = bytearray()
+        self.blobs = []
+
+        self.in_string = False
+        self.escape = False
+        self.string = bytearray()
+        self.last_string = None
+        self.expect_colon = False
+        self.blob_next = False
+        self.blob = None
+        self.failed = False
+
+    def feed(self, data):
+        if self.failed:
+            return
+        try:
+            self._feed(data)
+        except (binascii.Error, ValueError, OSError) as e:
+            print("dropping notification:", e)
+            self.abort()
+
+    def abort(self):
+        """Discards the blob being written; later input is ignored and close() returns None."""
+        self.failed = True
+        if self.blob is not None:
+            self.blob.abort()
+            self.blob = None
+
+    def _feed(self, data):
+        i = 0
+        n = len(data)
+        while i < n:
+            if self.blob is not None:
+                end = data.find(b'"', i)
+                if end < 0:
+                    self.blob.write(data[i:])
+                    return
+                self.blob.write(data[i:end])
+                self._end_blob()
+                i = end + 1
+                continue
+
+            c = data[i]
+            i += 1
+
+            if self.in_string:
+                self.skeleton.append(c)
+                if self.escape:
+                    self.escape = False
+                elif c == 0x5C:
+                    self.escape = True
+                elif c == 0x22:
+                    self.in_string = False
+                    self.last_string = bytes(self.string)
+                    self.expect_colon = True
+                elif len(self.string) < 32:
+                    self.string.append(c)
+                continue
+
+            if c in WHITESPACE:
+                self.skeleton.append(c)
+                continue
+
+            if self.blob_next:
+                self.blob_next = False
+                if c == 0x22:
+                    self.blob = BlobWriter(self.store)
+                    continue
+
+            if c == 0x22:
+                self.in_string = True
+                self.string.clear()
+            elif c == 0x3A and self.expect_colon and self.last_string in BLOB_KEYS:
+                self.blob_next = True
+            self.expect_colon = False
+            self.skeleton.append(c)
+
+    def _end_blob(self):
+        path, digest, size = self.blob.finish()
+        error, self.blob = self.blob.error, None
+        if error is not None:
+            print("dropping bad image data:", error)
+        elif path is None:
+            self.skeleton += b'""'
+            return
+        self.blobs.append((path, digest, error))
+        self.skeleton += f'"{PLACEHOLDER}{len(self.blobs) - 1}"'.encode("ascii")
+
+    def close(self):
+        """Returns the parsed payload with blobs replaced by file references, or None."""
+        if self.failed:
+            return None
+        if self.blob is not None:
+            self.abort()
+            return None
+        try:
+            payload = json.loads(self.skeleton.decode("utf-8", errors="replace"))
+        except Exception:
+            return None
+        self._resolve(payload)
+        return payload
+
+    def _resolve(self, node):
+        if isinstance(node, dict):
+            data = node.get("Data")
+            if isinstance(data, str) and data.startswith(PLACEHOLDER):
+                path, digest, error = self.blobs[int(data[len(PLACEHOLDER):])]
+                del node["Data"]
+                if error is not None:
+                    node["DataError"] = error
+                else:
+                    node["DataFile"] = path
+                    node["DataSHA256"] = digest
+            for v in node.values():
+                self._resolve(v)
+        elif isinstance(node, list):
+            for v in node:
+                self._resolve(v)
+
+
+def parse_stream(read, length, store):
+    """Pull `length` bytes through read(n) and parse them incrementally."""
+    parser = StreamingPayloadParser(store)
+    remaining = length
+    while remaining > 0:
+        chunk = read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        parser.feed(chunk)
+        remaining -= len(chunk)
+    return parser.close()
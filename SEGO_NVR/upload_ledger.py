@@ -0,0 +1,61 @@
+"""
+Durable per-person record of what bulkimport has sent to the NVR.
+
+One JSON line per outcome (PersonID, name, source file, image sha256, ok or
+failed or deleted, NVR result), fsynced after every batch. On load the newest
+line per PersonID wins, so the ledger can be appended to across any number of
+runs. bulkimport --sync uses it as the local index of what the library holds.
+"""
+import json
+import os
+from datetime import datetime
+
+
+class UploadLedger:
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}       # PersonID -> latest record
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    self.entries[rec["PersonID"]] = rec
+        self.f = open(path, "a", encoding="utf-8")
+
+    def record(self, items, ok, result="", status=None):
+        """items: dicts with pid, name, src, sha256. status overrides ok/failed (e.g. "deleted")."""
+        now = datetime.now().isoformat(timespec="seconds")
+        for item in items:
+            rec = {
+                "PersonID": item["pid"],
+                "Name": item["name"],
+                "Source": str(item["src"]),
+                "SHA256": item["sha256"],
+                "Status": status or ("ok" if ok else "failed"),
+                "Result": result,
+                "Time": now,
+            }
+            self.entries[rec["PersonID"]] = rec
+            self.f.write(json.dumps(rec) + "\n")
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def acknowledged(self, pid, sha256):
+        rec = self.entries.get(pid)
+        return rec is not None and rec["Status"] == "ok" and rec["SHA256"] == sha256
+
+    def failures(self):
+        return [rec for rec in self.entries.values() if rec["Status"] == "failed"]
+
+    def managed(self):
+        """PersonIDs this ledger put on the NVR and has not since deleted."""
+        return {pid for pid, rec in self.entries.items() if rec["Status"] != "deleted"}
+
+    def ids_by_name(self):
+        return {rec["Name"]: rec["PersonID"] for rec in self.entries.values()}
+
+    def close(self):
+        self.f.close()